@@ -0,0 +1,37 @@
+# Generated by Django 5.0.7 on 2026-10-15 02:57
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def poblar_accion_codigo(apps, schema_editor):
+    """
+    Rellena accion_codigo para los registros existentes siguiendo
+    la misma regla que bitacora.models.clasificar_accion.
+    """
+    Bitacora = apps.get_model('bitacora', 'Bitacora')
+
+    Bitacora.objects.filter(
+        accion__icontains='placa'
+    ).update(accion_codigo='OCR_PLACA')
+
+    Bitacora.objects.filter(
+        Q(accion__icontains='reconocimiento facial') |
+        Q(accion__icontains='reconocimiento_facial')
+    ).update(accion_codigo='RF')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bitacora', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bitacora',
+            name='accion_codigo',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=16),
+        ),
+        migrations.RunPython(poblar_accion_codigo, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,24 @@ from django.db import models
 from django.conf import settings
 from django.utils.timezone import now
 
+
+ACCION_RECONOCIMIENTO_FACIAL = 'RF'
+ACCION_RECONOCIMIENTO_PLACA = 'OCR_PLACA'
+
+
+def clasificar_accion(accion):
+    """
+    Retorna el código normalizado de una acción libre de la bitácora
+    ('RF', 'OCR_PLACA' o '' si no es un evento de reconocimiento).
+    """
+    texto = (accion or '').lower().replace('_', ' ')
+    if 'reconocimiento facial' in texto:
+        return ACCION_RECONOCIMIENTO_FACIAL
+    if 'placa' in texto:
+        return ACCION_RECONOCIMIENTO_PLACA
+    return ''
+
+
 class Bitacora(models.Model):
     MODULOS = [
         ('USUARIOS', 'Usuarios'),
@@ -19,12 +37,22 @@ class Bitacora(models.Model):
         blank=True
     )
     accion = models.CharField(max_length=100)  # LOGIN, LOGOUT, CREACION_USUARIO, etc.
+    # Código normalizado de la acción, calculado al guardar (ver clasificar_accion)
+    accion_codigo = models.CharField(max_length=16, blank=True, default='', db_index=True, editable=False)
     descripcion = models.TextField(blank=True)
     fecha_hora = models.DateTimeField(default=now)
     ip = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     modulo = models.CharField(max_length=50, choices=MODULOS, default='GENERAL')
 
+    def save(self, *args, **kwargs):
+        self.accion_codigo = clasificar_accion(self.accion)
+        # Un guardado parcial de la acción también escribe su código
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'accion' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'accion_codigo'}
+        super().save(*args, **kwargs)
+
 def __str__(self):
     usuario = getattr(self.usuario, "username", "Sistema")
     return f"{self.fecha_hora} | {usuario} | {self.accion} | {self.modulo}"
\ No newline at end of file
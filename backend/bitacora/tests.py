@@ -1,3 +1,21 @@
+"""
+Tests para el módulo de bitácora.
+"""
 from django.test import TestCase
 
-# Create your tests here.
+from .models import Bitacora, ACCION_RECONOCIMIENTO_FACIAL, ACCION_RECONOCIMIENTO_PLACA
+
+
+class BitacoraAccionCodigoTestCase(TestCase):
+    """accion_codigo se mantiene al día con accion"""
+
+    def test_update_fields_con_accion(self):
+        """Test: save(update_fields=['accion']) también escribe accion_codigo"""
+        registro = Bitacora.objects.create(accion='Reconocimiento facial')
+        self.assertEqual(registro.accion_codigo, ACCION_RECONOCIMIENTO_FACIAL)
+
+        registro.accion = 'Lectura de placa'
+        registro.save(update_fields=['accion'])
+
+        registro.refresh_from_db()
+        self.assertEqual(registro.accion_codigo, ACCION_RECONOCIMIENTO_PLACA)
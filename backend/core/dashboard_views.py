@@ -4,19 +4,38 @@ Consolida estadísticas de todos los módulos del sistema.
 """
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
-from rest_framework.response import Response
+import orjson
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
 from django.db.models import Count, Sum, Q, Avg
+from django.db.models.functions import TruncMonth
+from django.http import HttpResponse
 from django.utils import timezone
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from decimal import Decimal
+from dateutil.relativedelta import relativedelta
 
-from pagos.models import Expensa, Pago
-from multas.models import Multa
-from residentes.models import Residente
-from unidades.models import UnidadHabitacional
-from reservas.models import Reserva
-from vehiculos.models import Vehiculo
-from bitacora.models import Bitacora
+
+DASHBOARD_CACHE_KEY = 'dashboard:stats:v2'
+
+# Candado del recálculo: una sola petición recalcula al expirar la cache
+DASHBOARD_LOCK_KEY = f'{DASHBOARD_CACHE_KEY}:recalculando'
+# Segundos que vive el candado (por si el proceso que recalcula muere) y que
+# las demás peticiones esperan antes de recalcular por su cuenta
+DASHBOARD_LOCK_TIMEOUT = 15
+DASHBOARD_LOCK_ESPERA = 0.1
+
+
+def invalidar_cache_dashboard():
+    """
+    Elimina las estadísticas cacheadas para forzar su recálculo. Registrarla
+    con transaction.on_commit: borrada antes de confirmar, una lectura
+    concurrente volvería a cachear los datos previos al cambio.
+    """
+    cache.delete(DASHBOARD_CACHE_KEY)
 
 
 @api_view(['GET'])
@@ -33,191 +52,339 @@ def dashboard_stats(request):
     - Estadísticas de reservas
     - Estadísticas de IA (reconocimientos)
     - Datos para gráficos temporales
+    
+    El JSON ya serializado se cachea durante DASHBOARD_CACHE_TIMEOUT segundos
+    y se invalida al registrar pagos o multas.
+    """
+    return HttpResponse(_estadisticas_cacheadas(), content_type='application/json')
+
+
+def _serializar_estadisticas():
+    """Estadísticas del dashboard ya serializadas a JSON"""
+    return orjson.dumps(_calcular_estadisticas(), default=_json_default)
+
+
+def _estadisticas_cacheadas():
+    """
+    JSON de las estadísticas desde la cache. En un cache miss solo recalcula
+    la petición que obtiene el candado (cache.add); las demás esperan a que
+    el resultado quede en la cache en lugar de lanzar cada una sus consultas
+    (y sus DASHBOARD_QUERY_WORKERS conexiones).
+    """
+    limite = time.monotonic() + DASHBOARD_LOCK_TIMEOUT
+    while True:
+        contenido = cache.get(DASHBOARD_CACHE_KEY)
+        if contenido is not None:
+            return contenido
+        
+        if cache.add(DASHBOARD_LOCK_KEY, True, DASHBOARD_LOCK_TIMEOUT):
+            try:
+                contenido = _serializar_estadisticas()
+                cache.set(DASHBOARD_CACHE_KEY, contenido, settings.DASHBOARD_CACHE_TIMEOUT)
+            finally:
+                cache.delete(DASHBOARD_LOCK_KEY)
+            return contenido
+        
+        # Quien tiene el candado tarda demasiado: calcular sin cachear
+        if time.monotonic() >= limite:
+            return _serializar_estadisticas()
+        time.sleep(DASHBOARD_LOCK_ESPERA)
+
+
+def _json_default(obj):
+    """Convierte a JSON los tipos que orjson no soporta (como DRF: Decimal -> float)"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    return str(obj)
+
+
+def _ejecutar_en_paralelo(consultas):
     """
+    Ejecuta consultas independientes en hilos separados y retorna sus
+    resultados por nombre. Cada hilo abre y cierra su propia conexión, así que
+    cada recálculo usa hasta DASHBOARD_QUERY_WORKERS conexiones nuevas (el
+    candado de _estadisticas_cacheadas evita que se multipliquen).
+    Con DASHBOARD_QUERY_WORKERS <= 1 se ejecutan en el hilo actual, sobre la
+    conexión de la petición.
+    """
+    workers = settings.DASHBOARD_QUERY_WORKERS
+    if workers <= 1:
+        return {nombre: consulta() for nombre, consulta in consultas.items()}
+    
+    def ejecutar(consulta):
+        try:
+            return consulta()
+        finally:
+            connection.close()
+    
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futuros = {
+            nombre: executor.submit(ejecutar, consulta)
+            for nombre, consulta in consultas.items()
+        }
+        return {nombre: futuro.result() for nombre, futuro in futuros.items()}
+
+
+def _calcular_estadisticas():
+    """Calcula las estadísticas consolidadas del dashboard"""
+    # Importaciones locales: solo se necesitan al recalcular (cache miss), y así
+    # core.urls y los signals de pagos/multas no arrastran estos módulos
+    from pagos.models import Expensa, Pago
+    from multas.models import Multa
+    from residentes.models import Residente
+    from unidades.models import UnidadHabitacional
+    from reservas.models import Reserva
+    from vehiculos.models import Vehiculo
+    from bitacora.models import (
+        Bitacora, ACCION_RECONOCIMIENTO_FACIAL, ACCION_RECONOCIMIENTO_PLACA
+    )
+    
     hoy = timezone.now().date()
     inicio_mes = hoy.replace(day=1)
+    inicio_proximo_mes = inicio_mes + relativedelta(months=1)
     hace_12_meses = hoy - timedelta(days=365)
     
+    # Inicio de cada uno de los últimos 6 meses (del más antiguo al actual)
+    ultimos_meses = [inicio_mes - relativedelta(months=i) for i in range(5, -1, -1)]
+    
+    # ==================== CONSULTAS ====================
+    
+    # Expensa impaga con fecha de vencimiento pasada
+    expensa_vencida = Q(
+        estado__in=['pendiente', 'pagado_parcial'],
+        fecha_vencimiento__lt=hoy
+    )
+    
+    # Todas las consultas son independientes entre sí: se lanzan en paralelo
+    # para que el tiempo total sea el de la más lenta y no la suma de todas.
+    # Las que devuelven QuerySets se materializan dentro de su hilo.
+    resultados = _ejecutar_en_paralelo({
+        # Residentes
+        'residentes': lambda: Residente.objects.aggregate(
+            total=Count('id'),
+            activos=Count('id', filter=Q(estado='activo')),
+        ),
+        
+        # Unidades
+        'unidades': lambda: UnidadHabitacional.objects.aggregate(
+            total=Count('id'),
+            ocupadas=Count('id', filter=Q(estado='ocupado')),
+        ),
+        
+        # Vehículos
+        'vehiculos': lambda: Vehiculo.objects.filter(estado='activo').count(),
+        
+        # Totales y montos de expensas en una sola pasada
+        # (morosas: unidades con al menos una expensa vencida)
+        'expensas': lambda: Expensa.objects.aggregate(
+            total=Count('id'),
+            pendientes=Count('id', filter=Q(estado='pendiente')),
+            pagadas=Count('id', filter=Q(estado='pagado')),
+            parciales=Count('id', filter=Q(estado='pagado_parcial')),
+            vencidas=Count('id', filter=expensa_vencida),
+            morosas=Count('unidad', distinct=True, filter=expensa_vencida),
+            emitido=Sum('monto_total'),
+            cobrado=Sum('monto_pagado'),
+            pendiente=Sum('monto_pendiente'),
+        ),
+        
+        # Ingresos del mes (rango sobre fecha_pago para usar su índice)
+        'ingresos_mes': lambda: Pago.objects.filter(
+            fecha_pago__gte=inicio_mes,
+            fecha_pago__lt=inicio_proximo_mes
+        ).aggregate(total=Sum('monto'))['total'],
+        
+        # Top 5 unidades con mayor deuda
+        # (usa el índice parcial expensa_pend_unidad_idx sobre expensas impagas)
+        'deudas_por_unidad': lambda: list(Expensa.objects.filter(
+            estado__in=['pendiente', 'pagado_parcial']
+        ).values('unidad__codigo', 'unidad__id').annotate(
+            deuda_total=Sum('monto_pendiente')
+        ).order_by('-deuda_total')[:5]),
+        
+        # Multas
+        'multas': lambda: Multa.objects.aggregate(
+            total=Count('id'),
+            pendientes=Count('id', filter=Q(estado='pendiente')),
+            pagadas=Count('id', filter=Q(estado='pagado')),
+            monto_pendiente=Sum('monto', filter=Q(estado='pendiente')),
+            monto_cobrado=Sum('monto', filter=Q(estado='pagado')),
+        ),
+        
+        # Multas por tipo (una sola consulta agrupada)
+        'conteo_por_tipo': lambda: dict(
+            Multa.objects.values_list('tipo').annotate(cantidad=Count('id'))
+        ),
+        
+        # Reservas
+        'reservas': lambda: Reserva.objects.aggregate(
+            total=Count('id'),
+            pendientes=Count('id', filter=Q(estado='pendiente')),
+            mes=Count('id', filter=Q(
+                fecha_reserva__gte=inicio_mes,
+                fecha_reserva__lt=inicio_proximo_mes
+            )),
+        ),
+        
+        # Reservas por área común (top 5), agrupando por la FK entera
+        'reservas_por_area': lambda: list(Reserva.objects.values(
+            'area_comun_id', 'area_comun__nombre'
+        ).annotate(
+            total=Count('id')
+        ).order_by('-total')[:5]),
+        
+        # Eventos de reconocimiento de la bitácora en una sola pasada
+        # (accion_codigo está indexado, evita los ILIKE sobre toda la tabla)
+        'ia': lambda: Bitacora.objects.filter(
+            accion_codigo__in=[ACCION_RECONOCIMIENTO_FACIAL, ACCION_RECONOCIMIENTO_PLACA]
+        ).aggregate(
+            faciales=Count('id', filter=Q(accion_codigo=ACCION_RECONOCIMIENTO_FACIAL)),
+            placas=Count('id', filter=Q(accion_codigo=ACCION_RECONOCIMIENTO_PLACA)),
+            # 'identificado' también aparece en 'no identificado' (fallido)
+            exitosos=Count('id', filter=Q(fecha_hora__gte=inicio_mes) & (
+                Q(descripcion__icontains='exitoso') | Q(descripcion__icontains='identificado')
+            ) & ~Q(descripcion__icontains='no identificado')),
+            fallidos=Count('id', filter=Q(fecha_hora__gte=inicio_mes) & (
+                Q(descripcion__icontains='fallido') | Q(descripcion__icontains='no identificado')
+            )),
+        ),
+        
+        # Ingresos últimos 6 meses (una sola consulta agrupada por mes)
+        'ingresos_agrupados': lambda: {
+            (fila['mes'].year, fila['mes'].month): fila['total']
+            for fila in Pago.objects.filter(
+                fecha_pago__gte=ultimos_meses[0]
+            ).annotate(
+                mes=TruncMonth('fecha_pago')
+            ).values('mes').annotate(
+                total=Sum('monto')
+            ).order_by('mes')
+        },
+        
+        # Multas últimos 6 meses (una sola consulta agrupada por mes)
+        'multas_agrupadas': lambda: {
+            (fila['mes'].year, fila['mes'].month): fila['cantidad']
+            for fila in Multa.objects.filter(
+                fecha_emision__gte=ultimos_meses[0]
+            ).annotate(
+                mes=TruncMonth('fecha_emision')
+            ).values('mes').annotate(
+                cantidad=Count('id')
+            ).order_by('mes')
+        },
+    })
+    
     # ==================== KPIs PRINCIPALES ====================
     
     # Residentes
-    total_residentes = Residente.objects.count()
-    residentes_activos = Residente.objects.filter(estado='activo').count()
+    residentes = resultados['residentes']
+    total_residentes = residentes['total']
+    residentes_activos = residentes['activos']
     
     # Unidades
-    total_unidades = UnidadHabitacional.objects.count()
-    unidades_ocupadas = UnidadHabitacional.objects.filter(estado='ocupado').count()
+    unidades = resultados['unidades']
+    total_unidades = unidades['total']
+    unidades_ocupadas = unidades['ocupadas']
     tasa_ocupacion = (unidades_ocupadas / total_unidades * 100) if total_unidades > 0 else 0
     
     # Vehículos
-    total_vehiculos = Vehiculo.objects.filter(estado='activo').count()
+    total_vehiculos = resultados['vehiculos']
     
     # ==================== FINANZAS ====================
     
-    # Expensas del mes actual
-    expensas_mes = Expensa.objects.filter(
-        fecha_emision__year=hoy.year,
-        fecha_emision__month=hoy.month
-    )
-    
-    # Totales de expensas
-    total_expensas = Expensa.objects.count()
-    expensas_pendientes = Expensa.objects.filter(estado='pendiente').count()
-    expensas_vencidas = Expensa.objects.filter(
-        estado__in=['pendiente', 'pagado_parcial'],
-        fecha_vencimiento__lt=hoy
-    ).count()
+    expensas = resultados['expensas']
+    total_expensas = expensas['total']
+    expensas_pendientes = expensas['pendientes']
+    expensas_vencidas = expensas['vencidas']
     
     # Montos
-    monto_total_emitido = Expensa.objects.aggregate(
-        total=Sum('monto_total')
-    )['total'] or Decimal('0.00')
+    monto_total_emitido = expensas['emitido'] or Decimal('0.00')
+    monto_total_cobrado = expensas['cobrado'] or Decimal('0.00')
     
-    monto_total_cobrado = Expensa.objects.aggregate(
-        total=Sum('monto_pagado')
-    )['total'] or Decimal('0.00')
-    
-    monto_pendiente = monto_total_emitido - monto_total_cobrado
+    monto_pendiente = expensas['pendiente'] or Decimal('0.00')
     
     # Tasa de cobro
     tasa_cobro = (float(monto_total_cobrado) / float(monto_total_emitido) * 100) if monto_total_emitido > 0 else 0
     
     # Ingresos del mes
-    ingresos_mes = Pago.objects.filter(
-        fecha_pago__year=hoy.year,
-        fecha_pago__month=hoy.month
-    ).aggregate(total=Sum('monto'))['total'] or Decimal('0.00')
+    ingresos_mes = resultados['ingresos_mes'] or Decimal('0.00')
     
     # ==================== MOROSIDAD ====================
     
-    # Unidades morosas (con al menos una expensa vencida)
-    unidades_morosas = Expensa.objects.filter(
-        estado__in=['pendiente', 'pagado_parcial'],
-        fecha_vencimiento__lt=hoy
-    ).values('unidad').distinct().count()
-    
+    unidades_morosas = expensas['morosas']
     tasa_morosidad = (unidades_morosas / total_unidades * 100) if total_unidades > 0 else 0
     
     # Top 5 unidades con mayor deuda
-    deudas_por_unidad = Expensa.objects.filter(
-        estado__in=['pendiente', 'pagado_parcial']
-    ).values('unidad__codigo', 'unidad__id').annotate(
-        deuda_total=Sum('monto_total') - Sum('monto_pagado')
-    ).order_by('-deuda_total')[:5]
+    deudas_por_unidad = resultados['deudas_por_unidad']
     
     # ==================== MULTAS ====================
     
-    total_multas = Multa.objects.count()
-    multas_pendientes = Multa.objects.filter(estado='pendiente').count()
-    multas_pagadas = Multa.objects.filter(estado='pagado').count()
-    
-    monto_multas_pendiente = Multa.objects.filter(
-        estado='pendiente'
-    ).aggregate(
-        total=Sum('monto')
-    )['total'] or Decimal('0.00')
-    
-    monto_multas_cobrado = Multa.objects.filter(
-        estado='pagado'
-    ).aggregate(
-        total=Sum('monto')
-    )['total'] or Decimal('0.00')
-    
-    # Multas por tipo
-    multas_por_tipo = []
-    for tipo_key, tipo_label in Multa.TIPO_CHOICES:
-        count = Multa.objects.filter(tipo=tipo_key).count()
-        if count > 0:
-            multas_por_tipo.append({
-                'tipo': tipo_label,
-                'cantidad': count
-            })
+    multas = resultados['multas']
+    total_multas = multas['total']
+    multas_pendientes = multas['pendientes']
+    multas_pagadas = multas['pagadas']
+    monto_multas_pendiente = multas['monto_pendiente'] or Decimal('0.00')
+    monto_multas_cobrado = multas['monto_cobrado'] or Decimal('0.00')
+    
+    # Multas por tipo (en el orden de TIPO_CHOICES)
+    conteo_por_tipo = resultados['conteo_por_tipo']
+    multas_por_tipo = [
+        {'tipo': tipo_label, 'cantidad': conteo_por_tipo[tipo_key]}
+        for tipo_key, tipo_label in Multa.TIPO_CHOICES
+        if conteo_por_tipo.get(tipo_key, 0) > 0
+    ]
     
     # ==================== RESERVAS ====================
     
-    total_reservas = Reserva.objects.count()
-    reservas_pendientes = Reserva.objects.filter(estado='pendiente').count()
-    reservas_mes = Reserva.objects.filter(
-        fecha_reserva__year=hoy.year,
-        fecha_reserva__month=hoy.month
-    ).count()
+    reservas = resultados['reservas']
+    total_reservas = reservas['total']
+    reservas_pendientes = reservas['pendientes']
+    reservas_mes = reservas['mes']
     
     # Reservas por área común (top 5)
-    reservas_por_area = Reserva.objects.values(
-        'area_comun__nombre'
-    ).annotate(
-        total=Count('id')
-    ).order_by('-total')[:5]
+    reservas_por_area = resultados['reservas_por_area']
     
     # ==================== ESTADÍSTICAS DE IA ====================
     
-    # Obtener de bitácora los eventos de reconocimiento
-    reconocimientos_faciales = Bitacora.objects.filter(
-        accion__icontains='reconocimiento facial'
-    ).count()
-    
-    reconocimientos_placas = Bitacora.objects.filter(
-        accion__icontains='placa'
-    ).count()
-    
-    # Intentar obtener estadísticas más detalladas si están disponibles
-    try:
-        # Reconocimientos exitosos vs fallidos del mes
-        reconocimientos_mes = Bitacora.objects.filter(
-            fecha__gte=inicio_mes,
-            accion__icontains='reconocimiento'
-        )
-        ia_exitosos = reconocimientos_mes.filter(
-            Q(detalle__icontains='exitoso') | Q(detalle__icontains='identificado')
-        ).count()
-        ia_fallidos = reconocimientos_mes.filter(
-            Q(detalle__icontains='fallido') | Q(detalle__icontains='no identificado')
-        ).count()
-    except Exception:
-        ia_exitosos = 0
-        ia_fallidos = 0
+    ia = resultados['ia']
+    reconocimientos_faciales = ia['faciales']
+    reconocimientos_placas = ia['placas']
+    ia_exitosos = ia['exitosos']
+    ia_fallidos = ia['fallidos']
     
     # ==================== DATOS PARA GRÁFICOS ====================
     
     # Ingresos últimos 6 meses
-    ingresos_por_mes = []
-    for i in range(6):
-        fecha = hoy - timedelta(days=30*i)
-        total = Pago.objects.filter(
-            fecha_pago__year=fecha.year,
-            fecha_pago__month=fecha.month
-        ).aggregate(total=Sum('monto'))['total'] or 0
-        ingresos_por_mes.append({
-            'mes': fecha.strftime('%b %Y'),
-            'ingresos': float(total)
-        })
-    ingresos_por_mes.reverse()
+    ingresos_agrupados = resultados['ingresos_agrupados']
+    ingresos_por_mes = [
+        {
+            'mes': mes.strftime('%b %Y'),
+            'ingresos': float(ingresos_agrupados.get((mes.year, mes.month)) or 0)
+        }
+        for mes in ultimos_meses
+    ]
     
     # Expensas por estado
     expensas_por_estado = [
-        {'estado': 'Pagadas', 'cantidad': Expensa.objects.filter(estado='pagado').count()},
-        {'estado': 'Pendientes', 'cantidad': Expensa.objects.filter(estado='pendiente').count()},
-        {'estado': 'Parciales', 'cantidad': Expensa.objects.filter(estado='pagado_parcial').count()},
+        {'estado': 'Pagadas', 'cantidad': expensas['pagadas']},
+        {'estado': 'Pendientes', 'cantidad': expensas_pendientes},
+        {'estado': 'Parciales', 'cantidad': expensas['parciales']},
         {'estado': 'Vencidas', 'cantidad': expensas_vencidas},
     ]
     
     # Multas últimos 6 meses
-    multas_por_mes = []
-    for i in range(6):
-        fecha = hoy - timedelta(days=30*i)
-        count = Multa.objects.filter(
-            fecha_emision__year=fecha.year,
-            fecha_emision__month=fecha.month
-        ).count()
-        multas_por_mes.append({
-            'mes': fecha.strftime('%b %Y'),
-            'cantidad': count
-        })
-    multas_por_mes.reverse()
+    multas_agrupadas = resultados['multas_agrupadas']
+    multas_por_mes = [
+        {
+            'mes': mes.strftime('%b %Y'),
+            'cantidad': multas_agrupadas.get((mes.year, mes.month), 0)
+        }
+        for mes in ultimos_meses
+    ]
     
     # ==================== RESPUESTA CONSOLIDADA ====================
     
-    return Response({
+    return {
         # KPIs principales
         'kpis': {
             'residentes': {
@@ -251,7 +418,7 @@ def dashboard_stats(request):
         'morosidad': {
             'unidades_morosas': unidades_morosas,
             'tasa_morosidad': round(tasa_morosidad, 1),
-            'top_deudores': list(deudas_por_unidad),
+            'top_deudores': deudas_por_unidad,
         },
         
         # Multas
@@ -269,7 +436,7 @@ def dashboard_stats(request):
             'total': total_reservas,
             'pendientes': reservas_pendientes,
             'mes_actual': reservas_mes,
-            'por_area': list(reservas_por_area),
+            'por_area': reservas_por_area,
         },
         
         # IA
@@ -288,6 +455,6 @@ def dashboard_stats(request):
             'expensas_por_estado': expensas_por_estado,
             'multas_por_mes': multas_por_mes,
             'multas_por_tipo': multas_por_tipo,
-            'reservas_por_area': list(reservas_por_area),
+            'reservas_por_area': reservas_por_area,
         }
-    })
+    }
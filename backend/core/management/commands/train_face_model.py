@@ -4,9 +4,10 @@ Management command para entrenar el modelo de reconocimiento facial en Azure.
 Uso:
     python manage.py train_face_model
     python manage.py train_face_model --recreate  # Elimina y recrea el PersonGroup
+    python manage.py train_face_model --workers 4  # Registros concurrentes en Azure
 """
 import os
-import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
 
@@ -23,6 +24,13 @@ class Command(BaseCommand):
             action='store_true',
             help='Elimina y recrea el PersonGroup antes de entrenar',
         )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Cantidad de residentes registrados en paralelo en Azure '
+                 '(usar 1 si la cuota de la suscripción es baja)',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('\n' + '=' * 80))
@@ -55,11 +63,13 @@ class Command(BaseCommand):
                 'Ejecuta primero: python manage.py seed ia_dataset --force'
             )
 
-        # Obtener directorios de residentes
-        residente_dirs = [
-            d for d in glob.glob(os.path.join(dataset_path, '*'))
-            if os.path.isdir(d)
-        ]
+        # Obtener directorios de residentes (como glob('*'): sin ocultos y
+        # siguiendo enlaces simbólicos)
+        with os.scandir(dataset_path) as entries:
+            residente_dirs = [
+                entry.path for entry in entries
+                if not entry.name.startswith('.') and entry.is_dir()
+            ]
 
         if not residente_dirs:
             raise CommandError(
@@ -74,16 +84,38 @@ class Command(BaseCommand):
         registered_count = 0
         error_count = 0
 
+        # Obtener todos los residentes del dataset en una sola consulta
+        # (el nombre de cada directorio es el ID del residente)
+        residentes = Residente.objects.in_bulk([
+            int(nombre) for nombre in map(os.path.basename, residente_dirs)
+            if nombre.isdigit()
+        ])
+
+        # Preparar (residente, fotos) de cada directorio antes de llamar a Azure
+        pendientes = []
         for residente_dir in residente_dirs:
             # Obtener ID del residente desde el nombre del directorio
             residente_id = os.path.basename(residente_dir)
 
             try:
-                # Obtener residente de la BD
-                residente = Residente.objects.get(id=residente_id)
+                residente = residentes.get(int(residente_id)) if residente_id.isdigit() else None
+                if residente is None:
+                    self.stdout.write(
+                        self.style.WARNING(
+                            f'  ⚠️  Residente ID {residente_id} no existe en BD'
+                        )
+                    )
+                    error_count += 1
+                    continue
 
                 # Obtener todas las fotos del residente
-                image_paths = glob.glob(os.path.join(residente_dir, '*.jpg'))
+                with os.scandir(residente_dir) as entries:
+                    image_paths = [
+                        entry.path for entry in entries
+                        if not entry.name.startswith('.')
+                        and entry.is_file()
+                        and entry.name.lower().endswith(('.jpg', '.jpeg'))
+                    ]
 
                 if not image_paths:
                     self.stdout.write(
@@ -93,12 +125,42 @@ class Command(BaseCommand):
                     )
                     continue
 
-                # Registrar en Azure
-                azure_person_id = orchestrator.add_person(
+                pendientes.append((residente, image_paths))
+
+            except Exception as e:
+                self.stdout.write(
+                    self.style.ERROR(
+                        f'  ✗ Error procesando directorio {residente_dir}: {str(e)}'
+                    )
+                )
+                error_count += 1
+                continue
+
+        # Registrar en Azure en paralelo (cada registro son varias llamadas HTTPS)
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            futuros = {
+                executor.submit(
+                    orchestrator.add_person,
                     person_id=str(residente.id),
                     name=residente.get_nombre_completo(),
                     image_paths=image_paths
-                )
+                ): (residente, image_paths)
+                for residente, image_paths in pendientes
+            }
+
+            for futuro in as_completed(futuros):
+                residente, image_paths = futuros[futuro]
+
+                try:
+                    azure_person_id = futuro.result()
+                except Exception as e:
+                    self.stdout.write(
+                        self.style.ERROR(
+                            f'  ✗ Error registrando {residente.get_nombre_completo()}: {str(e)}'
+                        )
+                    )
+                    error_count += 1
+                    continue
 
                 if azure_person_id:
                     registered_count += 1
@@ -116,24 +178,6 @@ class Command(BaseCommand):
                         )
                     )
 
-            except Residente.DoesNotExist:
-                self.stdout.write(
-                    self.style.WARNING(
-                        f'  ⚠️  Residente ID {residente_id} no existe en BD'
-                    )
-                )
-                error_count += 1
-                continue
-
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(
-                        f'  ✗ Error procesando directorio {residente_dir}: {str(e)}'
-                    )
-                )
-                error_count += 1
-                continue
-
         self.stdout.write(
             f'\n  📊 Registrados: {registered_count}, Errores: {error_count}\n'
         )
@@ -0,0 +1,61 @@
+"""
+Utilidades compartidas para serializers.
+"""
+import copy
+
+from rest_framework import serializers
+
+
+class CachedFieldsModelSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer que construye sus campos una sola vez por clase.
+
+    get_fields() de ModelSerializer introspecciona el modelo y arma cada campo
+    en cada instanciación; aquí se guarda el resultado por clase y cada
+    instancia recibe copias propias, porque DRF enlaza (bind) los campos a su
+    serializer padre.
+    """
+    _fields_cache = {}
+
+    def get_fields(self):
+        cls = type(self)
+        campos = CachedFieldsModelSerializer._fields_cache.get(cls)
+        if campos is None:
+            campos = super().get_fields()
+            CachedFieldsModelSerializer._fields_cache[cls] = campos
+        return {nombre: copy.deepcopy(campo) for nombre, campo in campos.items()}
+
+
+class FieldsListSerializerMixin:
+    """
+    Respuesta parcial: el cliente pide solo algunos campos con ?fields=a,b,c.
+
+    El serializer recibe los campos en el kwarg `fields` y descarta el resto;
+    la vista usa campos_solicitados() para cargar solo las relaciones que
+    esos campos necesitan.
+    """
+
+    def __init__(self, *args, **kwargs):
+        campos = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if campos is not None:
+            for nombre in set(self.fields) - set(campos):
+                self.fields.pop(nombre)
+
+    @staticmethod
+    def campos_solicitados(request):
+        """Conjunto de campos pedidos en ?fields=, o None si no se filtra"""
+        valor = request.query_params.get('fields') if request is not None else None
+        if not valor:
+            return None
+        return {campo.strip() for campo in valor.split(',') if campo.strip()}
+
+    @staticmethod
+    def relaciones_para(campos, mapa):
+        """Relaciones de `mapa` (campo -> relaciones) que requieren los campos pedidos"""
+        return [
+            relacion
+            for campo, relaciones in mapa.items()
+            if campos is None or campo in campos
+            for relacion in relaciones
+        ]
@@ -165,6 +165,7 @@ SITE_ID = 1  # importante para allauth
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "whitenoise.middleware.WhiteNoiseMiddleware",  # Archivos estáticos
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -351,13 +352,38 @@ SOCIALACCOUNT_PROVIDERS = {
 }
 
 # ====== CACHE CONFIGURATION ======
-# Configuración para verificación móvil
-CACHES = {
-    "default": {
-        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
-        "LOCATION": "unique-snowflake",
+# Configuración para verificación móvil y estadísticas del dashboard.
+# Si hay REDIS_URL (Docker) se usa Redis; si no, cache en memoria local.
+REDIS_URL = os.getenv("REDIS_URL", "")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
     }
-}
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "unique-snowflake",
+        }
+    }
+
+# Tiempo de vida (segundos) de las estadísticas cacheadas del dashboard
+DASHBOARD_CACHE_TIMEOUT = int(os.getenv("DASHBOARD_CACHE_TIMEOUT", "60"))
+
+# Tiempo de vida (segundos) de /api/mantenimiento/tareas/estadisticas/
+MANTENIMIENTO_ESTADISTICAS_CACHE_TIMEOUT = int(
+    os.getenv("MANTENIMIENTO_ESTADISTICAS_CACHE_TIMEOUT", "45")
+)
+
+# Hilos para lanzar en paralelo las consultas del dashboard (1 = secuencial).
+# Cada hilo abre y cierra su propia conexión a la base de datos: cada
+# recálculo (cache miss, uno a la vez) usa hasta este número de conexiones
+# además de la de la petición; considerarlo junto a max_connections.
+DASHBOARD_QUERY_WORKERS = int(os.getenv("DASHBOARD_QUERY_WORKERS", "4"))
 
 # ====== EMAIL BACKENDS ======
 # Backend de email personalizado para verificación móvil
@@ -393,6 +419,17 @@ MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 
+# WhiteNoise sirve /static/ desde el middleware (comprimido y con cache headers),
+# así no hace falta agregar rutas static() al urlconf
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
 # ====== CONFIGURACIÓN DE OCR (Tesseract) ======
 # Región para validación de placas (BOLIVIA, ARGENTINA, etc.)
 OCR_REGION = os.getenv("OCR_REGION", "BOLIVIA")
@@ -0,0 +1,38 @@
+"""
+Tests para el dashboard administrativo.
+"""
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from datetime import timedelta
+
+from .dashboard_views import _calcular_estadisticas
+from bitacora.models import Bitacora
+
+
+@override_settings(DASHBOARD_QUERY_WORKERS=1)
+class EstadisticasIATestCase(TestCase):
+    """Contadores de reconocimientos exitosos / fallidos del mes actual"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        for descripcion in (
+            'Residente identificado: Juan Pérez',
+            'Reconocimiento exitoso',
+            'Rostro no identificado',
+            'Reconocimiento fallido',
+        ):
+            Bitacora.objects.create(accion='Reconocimiento facial', descripcion=descripcion)
+        Bitacora.objects.create(accion='Reconocimiento de placa', descripcion='Placa no identificado')
+        # Fuera del mes actual: solo cuenta en los totales
+        Bitacora.objects.create(
+            accion='Reconocimiento facial',
+            descripcion='Residente identificado',
+            fecha_hora=timezone.now() - timedelta(days=62)
+        )
+
+    def test_exitosos_y_fallidos(self):
+        """Test: 'no identificado' cuenta solo como fallido"""
+        ia = _calcular_estadisticas()['ia']
+        self.assertEqual(ia['reconocimientos_faciales'], 5)
+        self.assertEqual(ia['reconocimientos_placas'], 1)
+        self.assertEqual(ia['mes_actual'], {'exitosos': 2, 'fallidos': 3})
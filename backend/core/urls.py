@@ -24,52 +24,58 @@ from core.dashboard_views import dashboard_stats
 
 
 # Endpoints principales del sistema
+# El resolver de Django recorre esta lista en orden en cada request, por lo que
+# las rutas más consultadas van primero. Al agregar un módulo nuevo, ubicarlo
+# según su tráfico esperado (normalmente en el bloque de "resto de módulos").
 urlpatterns = [
-    # Panel de administración de Django
-    path("admin/", admin.site.urls),
-    # Dashboard: estadísticas consolidadas
-    path("api/dashboard/stats/", dashboard_stats, name="dashboard-stats"),
+    # ---------- Rutas de mayor tráfico ----------
+    # Notificaciones: el frontend las consulta periódicamente (cada minuto)
+    path("api/notificaciones/", include("notificaciones.urls")),
     # ENDPOINTS DE API (todos bajo /api/)
     # Auth: login/logout/password/reset para clientes
-    # Ruta personalizada para logout
+    # Ruta personalizada para logout (debe ir antes de "api/auth/")
     path("api/auth/logout/", logout_view, name="rest_logout"),
     # Resto de rutas de autenticación
     path("api/auth/", include("dj_rest_auth.urls")),
-    # Auth: registro de clientes
-    path("api/auth/registration/", include("dj_rest_auth.registration.urls")),
-    # Admin: gestión de usuarios, roles y permisos
-    path("api/admin/", include("users.urls")),
+    # Dashboard: estadísticas consolidadas
+    path("api/dashboard/stats/", dashboard_stats, name="dashboard-stats"),
+    # Seguridad: reconocimiento facial, OCR de placas, y gestión de accesos
+    path("api/seguridad/", include("seguridad.urls")),
+    # ---------- Resto de módulos ----------
     # Residentes: gestión de residentes del condominio
     path("api/residentes/", include("residentes.urls")),
-    # Personal: gestión de personal de empresa
-    path("api/personal/", include("personal.urls")),
-    # ML: servicios de inteligencia artificial
-    path("api/ml/", include("services.urls")),
-    # Notificaciones: gestión de notificaciones del condominio
-    path("api/notificaciones/", include("notificaciones.urls")),
-    path("api/bitacora/", include("bitacora.urls")),
-    path("api/areas-comunes/", include("areas_comunes.urls")),
     # Reservas: gestión de reservas de áreas comunes
     path("api/reservas/", include("reservas.urls")),
-    # Inventario: gestión de inventario
-    path("api/inventario/", include("inventario.urls")),
-    # Unidades: gestión de unidades habitacionales
-    path("api/unidades/", include("unidades.urls")),
+    path("api/areas-comunes/", include("areas_comunes.urls")),
     # Pagos: gestión de expensas y pagos
     path("api/pagos/", include("pagos.urls")),
-    # Vehículos: gestión de vehículos y reconocimiento de placas
-    path("api/vehiculos/", include("vehiculos.urls")),
     # Multas: gestión de multas y sanciones
     path("api/multas/", include("multas.urls")),
     # Mantenimiento: gestión de tareas de mantenimiento
     path("api/mantenimiento/", include("mantenimiento.urls")),
-    # Seguridad: reconocimiento facial, OCR de placas, y gestión de accesos
-    path("api/seguridad/", include("seguridad.urls")),
+    # Unidades: gestión de unidades habitacionales
+    path("api/unidades/", include("unidades.urls")),
+    # Vehículos: gestión de vehículos y reconocimiento de placas
+    path("api/vehiculos/", include("vehiculos.urls")),
+    # Personal: gestión de personal de empresa
+    path("api/personal/", include("personal.urls")),
+    path("api/bitacora/", include("bitacora.urls")),
+    # Inventario: gestión de inventario
+    path("api/inventario/", include("inventario.urls")),
+    # Admin: gestión de usuarios, roles y permisos
+    path("api/admin/", include("users.urls")),
+    # ML: servicios de inteligencia artificial
+    path("api/ml/", include("services.urls")),
+    # Auth: registro de clientes
+    path("api/auth/registration/", include("dj_rest_auth.registration.urls")),
+    # ---------- Rutas de navegador ----------
+    # Panel de administración de Django
+    path("admin/", admin.site.urls),
     # Auth social: endpoints para login social (navegador)
     path("accounts/", include("allauth.urls")),
 ]
 
 # Servir archivos media en desarrollo
+# (los estáticos los sirve WhiteNoise; los media subidos en runtime no)
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -1,9 +1,91 @@
 """
 Admin para el módulo de mantenimiento.
 """
+from functools import lru_cache
+
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
+from django.db import transaction
 from django.utils.html import format_html
-from .models import TareaMantenimiento, RegistroMantenimiento, MaterialInsumo
+from django.utils.safestring import mark_safe
+from .models import TareaMantenimiento, RegistroMantenimiento, MaterialInsumo, anotaciones_vencimiento
+from .signals import notificaciones_en_lote
+
+
+# Colores y etiquetas de los badges, construidos una sola vez por proceso
+_TIPO_COLORS = {
+    'preventivo': '#28a745',
+    'correctivo': '#ffc107',
+    'emergencia': '#dc3545',
+    'instalacion': '#17a2b8',
+    'reparacion': '#6c757d',
+    'limpieza': '#007bff',
+}
+_PRIORIDAD_COLORS = {
+    'baja': '#28a745',
+    'media': '#ffc107',
+    'alta': '#fd7e14',
+    'critica': '#dc3545',
+}
+_ESTADO_COLORS = {
+    'pendiente': '#6c757d',
+    'asignada': '#17a2b8',
+    'en_progreso': '#ffc107',
+    'completada': '#28a745',
+    'cancelada': '#dc3545',
+}
+_TIPO_ACCION_COLORS = {
+    'creacion': '#007bff',
+    'asignacion': '#17a2b8',
+    'inicio': '#ffc107',
+    'actualizacion': '#6c757d',
+    'completado': '#28a745',
+    'cancelacion': '#dc3545',
+    'comentario': '#6f42c1',
+}
+_TIPO_LABELS = dict(TareaMantenimiento.TIPO_CHOICES)
+_PRIORIDAD_LABELS = dict(TareaMantenimiento.PRIORIDAD_CHOICES)
+_ESTADO_LABELS = dict(TareaMantenimiento.ESTADO_CHOICES)
+_TIPO_ACCION_LABELS = dict(RegistroMantenimiento.TIPO_ACCION_CHOICES)
+
+_BADGE_HTML = '<span style="background-color: {}; color: white; padding: 3px 10px; border-radius: 3px;">{}</span>'
+_INCIDENCIA_MOVIL_HTML = mark_safe(
+    '<span style="background-color: #ff5722; color: white; padding: 3px 10px; border-radius: 3px;">📱 Móvil</span>'
+)
+_SIN_ORIGEN_HTML = mark_safe('<span style="color: #6c757d;">-</span>')
+_VENCIDA_HTML = mark_safe(
+    '<span style="background-color: #dc3545; color: white; padding: 3px 10px; border-radius: 3px;">VENCIDA</span>'
+)
+_OK_HTML = mark_safe('<span style="color: #28a745;">OK</span>')
+_ESTADOS_CERRADOS = frozenset({'completada', 'cancelada'})
+
+
+@lru_cache(maxsize=64)
+def _badge(color, label):
+    """HTML del badge; los pares (color, etiqueta) son finitos y se memorizan"""
+    return format_html(_BADGE_HTML, color, label)
+
+
+@lru_cache(maxsize=8)
+def _por_vencer_badge(dias):
+    """Badge de tareas que vencen en 3 días o menos"""
+    return format_html(
+        '<span style="background-color: #ffc107; color: black; padding: 3px 10px; border-radius: 3px;">{} días</span>',
+        dias
+    )
+
+
+def _queryset_foreignkey(db_field):
+    """
+    Queryset acotado para los widgets FK: solo las columnas que usa __str__
+    y el JOIN que evita una consulta por opción.
+    """
+    qs = db_field.remote_field.model._default_manager.all()
+    if db_field.name == 'tarea':
+        return qs.only('id', 'titulo', 'tipo', 'estado')
+    if db_field.name == 'realizado_por':
+        return qs.select_related('rol').only('id', 'username', 'rol__nombre')
+    return qs
 
 
 class MaterialInsumoInline(admin.TabularInline):
@@ -11,6 +93,10 @@ class MaterialInsumoInline(admin.TabularInline):
     model = MaterialInsumo
     extra = 1
     fields = ['nombre', 'cantidad', 'unidad', 'costo_unitario', 'proveedor', 'fecha_uso']
+    
+    def get_queryset(self, request):
+        # Solo las columnas que muestra el inline
+        return super().get_queryset(request).only('id', 'tarea_id', *self.fields)
 
 
 class RegistroMantenimientoInline(admin.TabularInline):
@@ -22,6 +108,35 @@ class RegistroMantenimientoInline(admin.TabularInline):
     
     def has_add_permission(self, request, obj=None):
         return False
+    
+    def get_queryset(self, request):
+        # Cada fila muestra su __str__ (usa la tarea) y realizado_por (usa el rol)
+        return super().get_queryset(request).select_related('tarea', 'realizado_por__rol')
+
+
+class TareaMantenimientoChangeList(ChangeList):
+    """Changelist que solo trae las columnas que el listado muestra"""
+    
+    def get_queryset(self, request, exclude_parameters=None):
+        return super().get_queryset(request, exclude_parameters).select_related(None).select_related(
+            'personal_asignado',
+            'area_comun',
+        ).only(
+            'id',
+            'titulo',
+            'tipo',
+            'prioridad',
+            'estado',
+            'es_incidencia',
+            'fecha_limite',
+            'presupuesto_estimado',
+            'costo_real',
+            # __str__ de Personal
+            'personal_asignado__nombre',
+            'personal_asignado__apellido',
+            'personal_asignado__codigo_empleado',
+            'area_comun__nombre',
+        )
 
 
 @admin.register(TareaMantenimiento)
@@ -55,7 +170,7 @@ class TareaMantenimientoAdmin(admin.ModelAdmin):
         'descripcion',
         'ubicacion_especifica',
         'personal_asignado__nombre',
-        'personal_asignado__apellido_paterno',
+        'personal_asignado__apellido',
         'reportado_por_residente__nombre',
     ]
     readonly_fields = [
@@ -130,83 +245,73 @@ class TareaMantenimientoAdmin(admin.ModelAdmin):
     )
     inlines = [MaterialInsumoInline, RegistroMantenimientoInline]
     date_hierarchy = 'fecha_creacion'
+    actions = ['completar_tareas']
+    list_select_related = ('personal_asignado', 'area_comun')
+    autocomplete_fields = [
+        'personal_asignado',
+        'area_comun',
+        'reportado_por_residente',
+        'creado_por',
+    ]
+    
+    def get_changelist(self, request, **kwargs):
+        return TareaMantenimientoChangeList
+    
+    def get_queryset(self, request):
+        # Un solo JOIN en lugar de una consulta por fila para las FKs;
+        # vencimiento y días restantes se calculan en la misma consulta
+        return super().get_queryset(request).select_related(
+            'personal_asignado',
+            'area_comun',
+            'creado_por',
+            'reportado_por_residente',
+        ).annotate(**anotaciones_vencimiento())
     
     def tipo_badge(self, obj):
-        colors = {
-            'preventivo': '#28a745',
-            'correctivo': '#ffc107',
-            'emergencia': '#dc3545',
-            'instalacion': '#17a2b8',
-            'reparacion': '#6c757d',
-            'limpieza': '#007bff',
-        }
-        color = colors.get(obj.tipo, '#6c757d')
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 10px; border-radius: 3px;">{}</span>',
-            color,
-            obj.get_tipo_display()
+        return _badge(
+            _TIPO_COLORS.get(obj.tipo, '#6c757d'),
+            _TIPO_LABELS.get(obj.tipo, obj.tipo)
         )
     tipo_badge.short_description = 'Tipo'
     
     def prioridad_badge(self, obj):
-        colors = {
-            'baja': '#28a745',
-            'media': '#ffc107',
-            'alta': '#fd7e14',
-            'critica': '#dc3545',
-        }
-        color = colors.get(obj.prioridad, '#6c757d')
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 10px; border-radius: 3px;">{}</span>',
-            color,
-            obj.get_prioridad_display()
+        return _badge(
+            _PRIORIDAD_COLORS.get(obj.prioridad, '#6c757d'),
+            _PRIORIDAD_LABELS.get(obj.prioridad, obj.prioridad)
         )
     prioridad_badge.short_description = 'Prioridad'
     
     def estado_badge(self, obj):
-        colors = {
-            'pendiente': '#6c757d',
-            'asignada': '#17a2b8',
-            'en_progreso': '#ffc107',
-            'completada': '#28a745',
-            'cancelada': '#dc3545',
-        }
-        color = colors.get(obj.estado, '#6c757d')
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 10px; border-radius: 3px;">{}</span>',
-            color,
-            obj.get_estado_display()
+        return _badge(
+            _ESTADO_COLORS.get(obj.estado, '#6c757d'),
+            _ESTADO_LABELS.get(obj.estado, obj.estado)
         )
     estado_badge.short_description = 'Estado'
     
     def vencida_badge(self, obj):
-        if obj.esta_vencida:
-            return format_html(
-                '<span style="background-color: #dc3545; color: white; padding: 3px 10px; border-radius: 3px;">VENCIDA</span>'
-            )
-        elif obj.dias_restantes <= 3 and obj.estado not in ['completada', 'cancelada']:
-            return format_html(
-                '<span style="background-color: #ffc107; color: black; padding: 3px 10px; border-radius: 3px;">{} días</span>',
-                obj.dias_restantes
-            )
-        return format_html(
-            '<span style="color: #28a745;">OK</span>'
-        )
+        if obj._vencida:
+            return _VENCIDA_HTML
+        if obj.estado in _ESTADOS_CERRADOS:
+            return _OK_HTML
+        dias = obj._dias_restantes.days
+        if dias <= 3:
+            return _por_vencer_badge(dias)
+        return _OK_HTML
     vencida_badge.short_description = 'Vencimiento'
+    vencida_badge.admin_order_field = '_dias_restantes'
     
     def es_incidencia_badge(self, obj):
         if obj.es_incidencia:
-            return format_html(
-                '<span style="background-color: #ff5722; color: white; padding: 3px 10px; border-radius: 3px;">📱 Móvil</span>'
-            )
-        return format_html('<span style="color: #6c757d;">-</span>')
+            return _INCIDENCIA_MOVIL_HTML
+        return _SIN_ORIGEN_HTML
     es_incidencia_badge.short_description = 'Origen'
     
     def imagen_preview(self, obj):
         if obj.imagen_incidencia:
+            imagen = obj.imagen_incidencia_thumb or obj.imagen_incidencia
             return format_html(
                 '<img src="{}" style="max-width: 300px; max-height: 200px; border-radius: 8px;"/>',
-                obj.imagen_incidencia.url
+                imagen.url
             )
         return "Sin imagen"
     imagen_preview.short_description = 'Vista previa de imagen'
@@ -215,6 +320,35 @@ class TareaMantenimientoAdmin(admin.ModelAdmin):
         if not change:  # Nueva tarea
             obj.creado_por = request.user
         super().save_model(request, obj, form, change)
+    
+    def completar_tareas(self, request, queryset):
+        """Marca como completadas las tareas seleccionadas"""
+        registros = []
+        # Una transacción; las notificaciones de las señales se insertan en lote
+        with transaction.atomic(), notificaciones_en_lote():
+            # defer(None): completar() escribe observaciones, que el changelist no carga
+            # iterator(): recorre la selección por bloques sin cargarla entera
+            tareas = queryset.defer(None).exclude(estado__in=['completada', 'cancelada'])
+            for tarea in tareas.iterator(chunk_size=500):
+                estado_anterior = tarea.estado
+                tarea.completar()
+                registros.append({
+                    'tarea_id': tarea.pk,
+                    'tipo_accion': 'completado',
+                    'descripcion': 'Tarea completada desde admin',
+                    'realizado_por': request.user,
+                    'estado_anterior': estado_anterior,
+                    'estado_nuevo': 'completada',
+                })
+            
+            # Un solo INSERT para todo el historial
+            RegistroMantenimiento.log_many(registros)
+        
+        self.message_user(
+            request,
+            f'{len(registros)} tarea(s) completada(s) exitosamente.'
+        )
+    completar_tareas.short_description = "Completar tareas seleccionadas"
 
 
 @admin.register(RegistroMantenimiento)
@@ -239,22 +373,17 @@ class RegistroMantenimientoAdmin(admin.ModelAdmin):
     ]
     readonly_fields = ['fecha']
     date_hierarchy = 'fecha'
+    list_select_related = ('tarea', 'realizado_por__rol')
+    autocomplete_fields = ['tarea', 'realizado_por']
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        kwargs.setdefault('queryset', _queryset_foreignkey(db_field))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
     
     def tipo_accion_badge(self, obj):
-        colors = {
-            'creacion': '#007bff',
-            'asignacion': '#17a2b8',
-            'inicio': '#ffc107',
-            'actualizacion': '#6c757d',
-            'completado': '#28a745',
-            'cancelacion': '#dc3545',
-            'comentario': '#6f42c1',
-        }
-        color = colors.get(obj.tipo_accion, '#6c757d')
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 10px; border-radius: 3px;">{}</span>',
-            color,
-            obj.get_tipo_accion_display()
+        return _badge(
+            _TIPO_ACCION_COLORS.get(obj.tipo_accion, '#6c757d'),
+            _TIPO_ACCION_LABELS.get(obj.tipo_accion, obj.tipo_accion)
         )
     tipo_accion_badge.short_description = 'Tipo de Acción'
 
@@ -285,3 +414,11 @@ class MaterialInsumoAdmin(admin.ModelAdmin):
     ]
     readonly_fields = ['costo_total']
     date_hierarchy = 'fecha_uso'
+    autocomplete_fields = ['tarea']
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        kwargs.setdefault('queryset', _queryset_foreignkey(db_field))
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('tarea')
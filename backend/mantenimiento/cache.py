@@ -0,0 +1,28 @@
+"""
+Cache de las estadísticas de mantenimiento.
+
+Cada combinación de filtros (query params) se cachea en su propia clave; en
+lugar de borrarlas una por una, todas llevan un número de versión que se
+incrementa cuando cambian las tareas.
+"""
+import hashlib
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+
+ESTADISTICAS_CACHE_PREFIX = 'mantenimiento:estadisticas'
+ESTADISTICAS_VERSION_KEY = f'{ESTADISTICAS_CACHE_PREFIX}:version'
+
+
+def clave_estadisticas(query_params):
+    """Clave de cache para unas estadísticas filtradas por query_params"""
+    version = cache.get(ESTADISTICAS_VERSION_KEY, 0)
+    filtros = urlencode(sorted(query_params.lists()), doseq=True)
+    return f'{ESTADISTICAS_CACHE_PREFIX}:v{version}:{hashlib.md5(filtros.encode()).hexdigest()}'
+
+
+def invalidar_cache_estadisticas():
+    """Invalida todas las estadísticas cacheadas (todas las combinaciones de filtros)"""
+    cache.add(ESTADISTICAS_VERSION_KEY, 0, None)
+    cache.incr(ESTADISTICAS_VERSION_KEY)
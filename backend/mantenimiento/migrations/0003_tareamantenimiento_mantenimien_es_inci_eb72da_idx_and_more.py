@@ -0,0 +1,26 @@
+# Generated by Django 5.0.7 on 2026-10-15 03:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas_comunes', '0001_initial'),
+        ('mantenimiento', '0002_tareamantenimiento_categoria_incidencia_and_more'),
+        ('personal', '0002_personal_usuario'),
+        ('residentes', '0007_residente_foto_perfil'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tareamantenimiento',
+            index=models.Index(fields=['es_incidencia', 'estado'], name='mantenimien_es_inci_eb72da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tareamantenimiento',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'en_progreso'])), fields=['fecha_limite'], name='tarea_vencidas_idx'),
+        ),
+    ]
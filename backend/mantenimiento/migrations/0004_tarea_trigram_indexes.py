@@ -0,0 +1,30 @@
+# Generated by Django 5.0.7 on 2026-10-15 03:13
+
+import django.contrib.postgres.indexes
+from django.contrib.postgres.operations import TrigramExtension
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas_comunes', '0001_initial'),
+        ('mantenimiento', '0003_tareamantenimiento_mantenimien_es_inci_eb72da_idx_and_more'),
+        ('personal', '0002_personal_usuario'),
+        ('residentes', '0007_residente_foto_perfil'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddIndex(
+            model_name='tareamantenimiento',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('titulo'), name='gin_trgm_ops'), name='tarea_titulo_trgm'),
+        ),
+        migrations.AddIndex(
+            model_name='tareamantenimiento',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('descripcion'), name='gin_trgm_ops'), name='tarea_descripcion_trgm'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-15 03:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mantenimiento', '0004_tarea_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tareamantenimiento',
+            name='imagen_incidencia_thumb',
+            field=models.ImageField(blank=True, editable=False, help_text='Miniatura de la foto generada automáticamente', null=True, upload_to='incidencias/miniaturas/%Y/%m/'),
+        ),
+    ]
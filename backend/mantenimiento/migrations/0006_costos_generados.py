@@ -0,0 +1,29 @@
+# Generated by Django 5.0.7 on 2026-10-15 03:23
+
+import django.db.models.expressions
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mantenimiento', '0005_tareamantenimiento_imagen_incidencia_thumb'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='materialinsumo',
+            name='costo_total',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('cantidad'), '*', models.F('costo_unitario')), help_text='Costo total del material en Bs.', output_field=models.DecimalField(decimal_places=2, max_digits=20)),
+        ),
+        migrations.AddField(
+            model_name='tareamantenimiento',
+            name='desviacion_presupuesto',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(presupuesto_estimado=0, then=models.Value(Decimal('0.00'))), default=django.db.models.expressions.CombinedExpression(models.F('costo_real'), '-', models.F('presupuesto_estimado'))), help_text='Desviación del presupuesto en Bs.', output_field=models.DecimalField(decimal_places=2, max_digits=11)),
+        ),
+        migrations.AddIndex(
+            model_name='materialinsumo',
+            index=models.Index(fields=['costo_total'], name='mantenimien_costo_t_3c85b1_idx'),
+        ),
+    ]
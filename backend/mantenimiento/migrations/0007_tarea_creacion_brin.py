@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-15 03:25
+
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('areas_comunes', '0001_initial'),
+        ('mantenimiento', '0006_costos_generados'),
+        ('personal', '0002_personal_usuario'),
+        ('residentes', '0007_residente_foto_perfil'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tareamantenimiento',
+            index=django.contrib.postgres.indexes.BrinIndex(fields=['fecha_creacion'], name='tarea_creacion_brin'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex, GinIndex, OpClass
+from django.db.models.functions import Concat, Upper
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from django.conf import settings
@@ -7,8 +9,37 @@ from personal.models import Personal
 from areas_comunes.models import AreaComun
 
 
-class TareaMantenimientoManager(models.Manager):
-    """Manager personalizado para TareaMantenimiento"""
+def _hoy():
+    """Fecha actual; se calcula una vez y se reutiliza donde sea posible"""
+    return timezone.now().date()
+
+
+def anotaciones_vencimiento(hoy=None):
+    """
+    Expresiones SQL equivalentes a esta_vencida / dias_restantes, para
+    annotate(): _vencida (bool) y _dias_restantes (intervalo hasta la fecha límite).
+    """
+    if hoy is None:
+        hoy = _hoy()
+    return {
+        '_vencida': models.Case(
+            models.When(estado__in=['completada', 'cancelada'], then=models.Value(False)),
+            models.When(fecha_limite__lt=hoy, then=models.Value(True)),
+            default=models.Value(False),
+            output_field=models.BooleanField(),
+        ),
+        '_dias_restantes': models.ExpressionWrapper(
+            models.F('fecha_limite') - models.Value(hoy, output_field=models.DateField()),
+            output_field=models.DurationField(),
+        ),
+    }
+
+
+class TareaMantenimientoQuerySet(models.QuerySet):
+    """
+    Filtros de TareaMantenimiento. Al ser un QuerySet se pueden encadenar
+    sobre un queryset ya filtrado (ej: get_queryset() de la vista).
+    """
     
     def pendientes(self):
         """Retorna tareas pendientes"""
@@ -18,9 +49,13 @@ class TareaMantenimientoManager(models.Manager):
         """Retorna tareas en progreso"""
         return self.filter(estado='en_progreso')
     
-    def vencidas(self):
-        """Retorna tareas pendientes que ya vencieron"""
-        hoy = timezone.now().date()
+    def vencidas(self, hoy=None):
+        """
+        Retorna tareas pendientes que ya vencieron.
+        hoy: fecha de referencia, para reutilizar la misma en varias consultas.
+        """
+        if hoy is None:
+            hoy = _hoy()
         return self.filter(
             estado__in=['pendiente', 'en_progreso'],
             fecha_limite__lt=hoy
@@ -42,6 +77,9 @@ class TareaMantenimientoManager(models.Manager):
         return self.filter(tipo=tipo)
 
 
+TareaMantenimientoManager = models.Manager.from_queryset(TareaMantenimientoQuerySet)
+
+
 class TareaMantenimiento(models.Model):
     """
     Modelo para gestionar tareas de mantenimiento del condominio.
@@ -118,6 +156,13 @@ class TareaMantenimiento(models.Model):
         null=True,
         help_text='Foto del problema reportado'
     )
+    imagen_incidencia_thumb = models.ImageField(
+        upload_to='incidencias/miniaturas/%Y/%m/',
+        blank=True,
+        null=True,
+        editable=False,
+        help_text='Miniatura de la foto generada automáticamente'
+    )
     # Residente que reportó la incidencia
     reportado_por_residente = models.ForeignKey(
         'residentes.Residente',
@@ -209,6 +254,17 @@ class TareaMantenimiento(models.Model):
         help_text='Costo real ejecutado en Bs.'
     )
     
+    # Calculado por la base de datos (costo_real - presupuesto_estimado)
+    desviacion_presupuesto = models.GeneratedField(
+        expression=models.Case(
+            models.When(presupuesto_estimado=0, then=models.Value(Decimal('0.00'))),
+            default=models.F('costo_real') - models.F('presupuesto_estimado'),
+        ),
+        output_field=models.DecimalField(max_digits=11, decimal_places=2),
+        db_persist=True,
+        help_text='Desviación del presupuesto en Bs.'
+    )
+    
     # Observaciones
     observaciones = models.TextField(
         blank=True,
@@ -238,33 +294,85 @@ class TareaMantenimiento(models.Model):
             models.Index(fields=['estado', 'prioridad']),
             models.Index(fields=['fecha_limite']),
             models.Index(fields=['personal_asignado', 'estado']),
+            models.Index(fields=['es_incidencia', 'estado']),
+            # Índice parcial para el manager vencidas(): solo tareas abiertas
+            models.Index(
+                fields=['fecha_limite'],
+                condition=models.Q(estado__in=['pendiente', 'en_progreso']),
+                name='tarea_vencidas_idx',
+            ),
+            # Trigramas sobre UPPER(col): la búsqueda icontains del admin
+            # (UPPER(col) LIKE UPPER('%q%')) puede usar estos índices
+            GinIndex(
+                OpClass(Upper('titulo'), name='gin_trgm_ops'),
+                name='tarea_titulo_trgm',
+            ),
+            GinIndex(
+                OpClass(Upper('descripcion'), name='gin_trgm_ops'),
+                name='tarea_descripcion_trgm',
+            ),
+            # fecha_creacion crece con el orden de inserción: BRIN basta para
+            # los rangos de fechas de date_hierarchy con un índice mínimo
+            BrinIndex(fields=['fecha_creacion'], name='tarea_creacion_brin'),
         ]
     
     def __str__(self):
         return f"{self.get_tipo_display()} - {self.titulo} ({self.get_estado_display()})"
     
+    # Campos que las señales comparan contra su valor en la BD
+    CAMPOS_SEGUIDOS = ('estado', 'personal_asignado_id')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Valores tal como se leyeron: las señales los comparan sin otro SELECT
+        if all(campo in instance.__dict__ for campo in cls.CAMPOS_SEGUIDOS):
+            instance._valores_originales = {
+                campo: instance.__dict__[campo] for campo in cls.CAMPOS_SEGUIDOS
+            }
+        return instance
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # La BD recalcula la desviación: se recarga al volver a leerla
+        self.__dict__.pop('desviacion_presupuesto', None)
+        # Las anotaciones de vencimiento pueden haber quedado desactualizadas
+        self.__dict__.pop('_vencida', None)
+        self.__dict__.pop('_dias_restantes', None)
+        
+        # Lo guardado pasa a ser el valor original para el próximo save()
+        update_fields = kwargs.get('update_fields')
+        originales = getattr(self, '_valores_originales', None)
+        if update_fields is None:
+            self._valores_originales = {
+                campo: getattr(self, campo) for campo in self.CAMPOS_SEGUIDOS
+            }
+        elif originales is not None:
+            for campo in self.CAMPOS_SEGUIDOS:
+                if campo in update_fields or campo.removesuffix('_id') in update_fields:
+                    originales[campo] = getattr(self, campo)
+    
     @property
     def esta_vencida(self):
         """Verifica si la tarea está vencida"""
+        if '_vencida' in self.__dict__:
+            return self._vencida
         if self.estado in ['completada', 'cancelada']:
             return False
-        return timezone.now().date() > self.fecha_limite
+        # Vencida equivale a días restantes negativos: una sola lectura de la fecha
+        return self.dias_restantes < 0
     
     @property
     def dias_restantes(self):
         """Calcula días restantes hasta la fecha límite"""
         if self.estado in ['completada', 'cancelada']:
             return 0
-        delta = self.fecha_limite - timezone.now().date()
+        # Calculado en la consulta (anotaciones_vencimiento)
+        if '_dias_restantes' in self.__dict__:
+            return self._dias_restantes.days
+        delta = self.fecha_limite - _hoy()
         return delta.days
     
-    @property
-    def desviacion_presupuesto(self):
-        """Calcula la desviación del presupuesto"""
-        if self.presupuesto_estimado == 0:
-            return 0
-        return self.costo_real - self.presupuesto_estimado
-    
     @property
     def porcentaje_desviacion(self):
         """Calcula el porcentaje de desviación del presupuesto"""
@@ -278,7 +386,7 @@ class TareaMantenimiento(models.Model):
         self.fecha_asignacion = timezone.now()
         if self.estado == 'pendiente':
             self.estado = 'asignada'
-        self.save()
+        self.save(update_fields=['personal_asignado', 'fecha_asignacion', 'estado', 'actualizado_en'])
         return True
     
     def iniciar_trabajo(self):
@@ -286,7 +394,7 @@ class TareaMantenimiento(models.Model):
         if self.estado in ['pendiente', 'asignada']:
             self.estado = 'en_progreso'
             self.fecha_inicio = timezone.now()
-            self.save()
+            self.save(update_fields=['estado', 'fecha_inicio', 'actualizado_en'])
             return True
         return False
     
@@ -298,15 +406,25 @@ class TareaMantenimiento(models.Model):
             self.costo_real = costo_real
         if observaciones:
             self.observaciones = observaciones
-        self.save()
+        self.save(update_fields=['estado', 'fecha_completado', 'costo_real', 'observaciones', 'actualizado_en'])
         return True
     
     def cancelar(self, motivo=None):
         """Cancela la tarea"""
         self.estado = 'cancelada'
+        campos = ['estado', 'actualizado_en']
+        if motivo:
+            # La BD antepone el motivo al valor actual: sin leer ni reescribir el texto
+            self.observaciones = Concat(
+                models.Value(f"CANCELADA: {motivo}\n"),
+                models.F('observaciones'),
+                output_field=models.TextField()
+            )
+            campos.append('observaciones')
+        self.save(update_fields=campos)
         if motivo:
-            self.observaciones = f"CANCELADA: {motivo}\n{self.observaciones}"
-        self.save()
+            # Se recarga al leerlo; el valor quedó calculado en la BD
+            self.__dict__.pop('observaciones', None)
         return True
 
 
@@ -370,6 +488,17 @@ class RegistroMantenimiento(models.Model):
     
     def __str__(self):
         return f"{self.get_tipo_accion_display()} - {self.tarea.titulo} ({self.fecha.strftime('%d/%m/%Y %H:%M')})"
+    
+    @classmethod
+    def log_many(cls, entries, batch_size=500):
+        """
+        Registra varias acciones en lote con un solo INSERT por bloque.
+        entries: iterable de dicts con los campos del registro.
+        """
+        return cls.objects.bulk_create(
+            [cls(**entry) for entry in entries],
+            batch_size=batch_size
+        )
 
 
 class MaterialInsumo(models.Model):
@@ -418,15 +547,26 @@ class MaterialInsumo(models.Model):
         help_text='Fecha de uso del material'
     )
     
+    # Calculado por la base de datos (cantidad * costo_unitario)
+    costo_total = models.GeneratedField(
+        expression=models.F('cantidad') * models.F('costo_unitario'),
+        output_field=models.DecimalField(max_digits=20, decimal_places=2),
+        db_persist=True,
+        help_text='Costo total del material en Bs.'
+    )
+    
     class Meta:
         verbose_name = 'Material/Insumo'
         verbose_name_plural = 'Materiales/Insumos'
         ordering = ['-fecha_uso']
+        indexes = [
+            models.Index(fields=['costo_total']),
+        ]
     
     def __str__(self):
         return f"{self.nombre} - {self.cantidad} {self.unidad}"
     
-    @property
-    def costo_total(self):
-        """Calcula el costo total del material"""
-        return self.cantidad * self.costo_unitario
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # La BD recalcula el costo total: se recarga al volver a leerlo
+        self.__dict__.pop('costo_total', None)
@@ -1,13 +1,61 @@
 """
 Serializers para el módulo de mantenimiento.
 """
+import base64
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import F, Prefetch, Value, prefetch_related_objects
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
+from django.utils import timezone
 from rest_framework import serializers
-from .models import TareaMantenimiento, RegistroMantenimiento, MaterialInsumo
+from core.serializers import CachedFieldsModelSerializer, FieldsListSerializerMixin
+from .models import TareaMantenimiento, RegistroMantenimiento, MaterialInsumo, anotaciones_vencimiento
+from personal.models import Personal
 from personal.serializers import PersonalSerializer
 from areas_comunes.serializers import AreaComunSerializer
+from .cache import invalidar_cache_estadisticas
+from .signals import generar_miniatura
+
+
+def url_absoluta(context, url):
+    """
+    URL absoluta de un archivo. Usa el prefijo (esquema + host) que la vista
+    calcula una vez por respuesta en 'prefijo_url'; si no está, lo arma con
+    request.build_absolute_uri().
+    """
+    prefijo = context.get('prefijo_url')
+    if prefijo is not None and url.startswith('/'):
+        return f'{prefijo}{url}'
+    request = context.get('request')
+    if request:
+        return request.build_absolute_uri(url)
+    return url
+
+# Constantes: las opciones no cambian entre peticiones
+_CATEGORIAS_VALIDAS = frozenset(c[0] for c in TareaMantenimiento.CATEGORIA_INCIDENCIA_CHOICES)
+_CATEGORIA_INVALIDA_MSG = (
+    f"Categoría inválida. Opciones: "
+    f"{', '.join(c[0] for c in TareaMantenimiento.CATEGORIA_INCIDENCIA_CHOICES)}"
+)
+
+
+def nombre_usuario(relacion):
+    """
+    Expresión SQL con el nombre a mostrar de un usuario relacionado:
+    "first_name last_name" o, si queda vacío, username.
+    """
+    return Coalesce(
+        NullIf(
+            Trim(Concat(f'{relacion}__first_name', Value(' '), f'{relacion}__last_name')),
+            Value(''),
+        ),
+        F(f'{relacion}__username'),
+    )
 
 
-class MaterialInsumoSerializer(serializers.ModelSerializer):
+class MaterialInsumoSerializer(CachedFieldsModelSerializer):
     """Serializer para materiales e insumos"""
     costo_total = serializers.DecimalField(
         max_digits=10,
@@ -32,10 +80,11 @@ class MaterialInsumoSerializer(serializers.ModelSerializer):
         read_only_fields = ['costo_total']
 
 
-class RegistroMantenimientoSerializer(serializers.ModelSerializer):
+class RegistroMantenimientoSerializer(CachedFieldsModelSerializer):
     """Serializer para registros de historial de mantenimiento"""
     tipo_accion_display = serializers.CharField(source='get_tipo_accion_display', read_only=True)
-    realizado_por_nombre = serializers.SerializerMethodField()
+    # Anotado en setup_eager_loading
+    realizado_por_nombre = serializers.CharField(read_only=True, allow_null=True)
     
     class Meta:
         model = RegistroMantenimiento
@@ -53,13 +102,13 @@ class RegistroMantenimientoSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['fecha']
     
-    def get_realizado_por_nombre(self, obj):
-        if obj.realizado_por:
-            return f"{obj.realizado_por.first_name} {obj.realizado_por.last_name}".strip() or obj.realizado_por.username
-        return None
+    @staticmethod
+    def setup_eager_loading(queryset):
+        """Anota el nombre de quien realizó la acción"""
+        return queryset.annotate(realizado_por_nombre=nombre_usuario('realizado_por'))
 
 
-class TareaMantenimientoSerializer(serializers.ModelSerializer):
+class TareaMantenimientoSerializer(FieldsListSerializerMixin, CachedFieldsModelSerializer):
     """
     Serializer completo para TareaMantenimiento con información detallada.
     """
@@ -77,17 +126,25 @@ class TareaMantenimientoSerializer(serializers.ModelSerializer):
     porcentaje_desviacion = serializers.FloatField(read_only=True)
     
     # Información relacionada (solo nombres para listado)
-    personal_asignado_nombre = serializers.SerializerMethodField()
-    area_comun_nombre = serializers.SerializerMethodField()
-    creado_por_nombre = serializers.SerializerMethodField()
+    personal_asignado_nombre = serializers.CharField(
+        source='personal_asignado.nombre_completo', read_only=True, allow_null=True
+    )
+    area_comun_nombre = serializers.CharField(
+        source='area_comun.nombre', read_only=True, allow_null=True
+    )
+    # Anotado en setup_eager_loading
+    creado_por_nombre = serializers.CharField(read_only=True, allow_null=True)
     
     # Nested serializers opcionales (para detalle)
     personal_asignado_detalle = PersonalSerializer(source='personal_asignado', read_only=True)
+    # Columnas del usuario del personal que lee personal_asignado_detalle
+    # (el resto se difiere en setup_eager_loading)
+    COLUMNAS_USUARIO_PERSONAL = ('id', 'username', 'is_active')
     area_comun_detalle = AreaComunSerializer(source='area_comun', read_only=True)
     
-    # Relaciones inversas
-    registros = RegistroMantenimientoSerializer(many=True, read_only=True)
-    materiales = MaterialInsumoSerializer(many=True, read_only=True)
+    # Relaciones inversas: listas precargadas con to_attr (ver prefetch_relaciones)
+    registros = RegistroMantenimientoSerializer(many=True, read_only=True, source='registros_cache')
+    materiales = MaterialInsumoSerializer(many=True, read_only=True, source='materiales_cache')
     
     class Meta:
         model = TareaMantenimiento
@@ -134,32 +191,82 @@ class TareaMantenimientoSerializer(serializers.ModelSerializer):
             'fecha_completado',
         ]
     
-    def get_personal_asignado_nombre(self, obj):
-        if obj.personal_asignado:
-            return obj.personal_asignado.nombre_completo
-        return None
+    @classmethod
+    def setup_eager_loading(cls, queryset, campos=None, hoy=None):
+        """
+        Carga en lote las relaciones que serializa este serializer.
+        campos: subconjunto pedido con ?fields= (None = todos).
+        hoy: fecha de referencia para las anotaciones de vencimiento.
+        """
+        select = cls.relaciones_para(campos, {
+            'personal_asignado_nombre': ['personal_asignado'],
+            'personal_asignado_detalle': ['personal_asignado__usuario'],
+            'area_comun_nombre': ['area_comun'],
+            'area_comun_detalle': ['area_comun'],
+        })
+        prefetch = cls.relaciones_para(campos, cls.prefetch_relaciones())
+        if campos is None or 'creado_por_nombre' in campos:
+            queryset = queryset.annotate(creado_por_nombre=nombre_usuario('creado_por'))
+        if campos is None or campos & {'esta_vencida', 'dias_restantes'}:
+            queryset = queryset.annotate(**anotaciones_vencimiento(hoy))
+        if select:
+            queryset = queryset.select_related(*select)
+        if campos is None or 'personal_asignado_detalle' in campos:
+            # Del usuario del personal solo se leen estas columnas (username, puede_acceder_sistema)
+            queryset = queryset.defer(*(
+                f'personal_asignado__usuario__{campo.name}'
+                for campo in get_user_model()._meta.concrete_fields
+                if campo.name not in cls.COLUMNAS_USUARIO_PERSONAL
+            ))
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch)
+        return queryset
     
-    def get_area_comun_nombre(self, obj):
-        if obj.area_comun:
-            return obj.area_comun.nombre
-        return None
+    @staticmethod
+    def prefetch_relaciones():
+        """
+        Prefetch por campo anidado. to_attr deja listas en la instancia: el
+        serializer las recorre directamente, sin volver a pasar por .all().
+        """
+        return {
+            'registros': [Prefetch(
+                'registros',
+                queryset=RegistroMantenimientoSerializer.setup_eager_loading(
+                    RegistroMantenimiento.objects.all()
+                ),
+                to_attr='registros_cache',
+            )],
+            'materiales': [Prefetch('materiales', to_attr='materiales_cache')],
+        }
     
-    def get_creado_por_nombre(self, obj):
-        if obj.creado_por:
-            return f"{obj.creado_por.first_name} {obj.creado_por.last_name}".strip() or obj.creado_por.username
-        return None
+    def to_representation(self, instance):
+        # Instancias que no pasaron por setup_eager_loading (o cuyo cache se
+        # invalidó al actualizarlas): se cargan aquí las listas que falten
+        faltantes = [
+            prefetch
+            for campo, prefetches in self.prefetch_relaciones().items()
+            if campo in self.fields
+            for prefetch in prefetches
+            if not hasattr(instance, prefetch.to_attr)
+        ]
+        if faltantes:
+            prefetch_related_objects([instance], *faltantes)
+        return super().to_representation(instance)
 
 
-class TareaMantenimientoListSerializer(serializers.ModelSerializer):
+class TareaMantenimientoListSerializer(FieldsListSerializerMixin, CachedFieldsModelSerializer):
     """
     Serializer ligero para listados de tareas (sin nested serializers).
     """
     tipo_display = serializers.CharField(source='get_tipo_display', read_only=True)
     estado_display = serializers.CharField(source='get_estado_display', read_only=True)
     prioridad_display = serializers.CharField(source='get_prioridad_display', read_only=True)
-    personal_asignado_nombre = serializers.SerializerMethodField()
-    personal_asignado_detalle = PersonalSerializer(source='personal_asignado', read_only=True)
-    area_comun_nombre = serializers.SerializerMethodField()
+    personal_asignado_nombre = serializers.CharField(
+        source='personal_asignado.nombre_completo', read_only=True, allow_null=True
+    )
+    area_comun_nombre = serializers.CharField(
+        source='area_comun.nombre', read_only=True, allow_null=True
+    )
     esta_vencida = serializers.BooleanField(read_only=True)
     dias_restantes = serializers.IntegerField(read_only=True)
     # Campos de incidencia
@@ -167,7 +274,25 @@ class TareaMantenimientoListSerializer(serializers.ModelSerializer):
         source='get_categoria_incidencia_display', 
         read_only=True
     )
-    reportado_por_residente_nombre = serializers.SerializerMethodField()
+    reportado_por_residente_nombre = serializers.CharField(
+        source='reportado_por_residente.nombre_completo', read_only=True, allow_null=True
+    )
+    
+    # Columnas que lee cada campo calculado (el resto se llama como su columna)
+    COLUMNAS = {
+        'tipo_display': ['tipo'],
+        'estado_display': ['estado'],
+        'prioridad_display': ['prioridad'],
+        'categoria_incidencia_display': ['categoria_incidencia'],
+        'esta_vencida': ['estado', 'fecha_limite'],
+        'dias_restantes': ['estado', 'fecha_limite'],
+        'personal_asignado_nombre': ['personal_asignado__nombre', 'personal_asignado__apellido'],
+        'area_comun_nombre': ['area_comun__nombre'],
+        'reportado_por_residente_nombre': [
+            'reportado_por_residente__nombre',
+            'reportado_por_residente__apellido',
+        ],
+    }
     
     class Meta:
         model = TareaMantenimiento
@@ -182,7 +307,6 @@ class TareaMantenimientoListSerializer(serializers.ModelSerializer):
             'estado_display',
             'personal_asignado',
             'personal_asignado_nombre',
-            'personal_asignado_detalle',
             'area_comun',
             'area_comun_nombre',
             'ubicacion_especifica',
@@ -201,33 +325,43 @@ class TareaMantenimientoListSerializer(serializers.ModelSerializer):
             'reportado_por_residente_nombre',
         ]
     
-    def get_personal_asignado_nombre(self, obj):
-        if obj.personal_asignado:
-            return obj.personal_asignado.nombre_completo
-        return None
-    
-    def get_area_comun_nombre(self, obj):
-        if obj.area_comun:
-            return obj.area_comun.nombre
-        return None
-    
-    def get_reportado_por_residente_nombre(self, obj):
-        if obj.reportado_por_residente:
-            return obj.reportado_por_residente.nombre_completo
-        return None
+    @classmethod
+    def setup_eager_loading(cls, queryset, campos=None, hoy=None):
+        """
+        Carga en lote las relaciones que serializa este serializer.
+        campos: subconjunto pedido con ?fields= (None = todos).
+        hoy: fecha de referencia para las anotaciones de vencimiento.
+        """
+        select = cls.relaciones_para(campos, {
+            'personal_asignado_nombre': ['personal_asignado'],
+            'area_comun_nombre': ['area_comun'],
+            'reportado_por_residente_nombre': ['reportado_por_residente'],
+        })
+        if select:
+            queryset = queryset.select_related(*select)
+        if campos is None or campos & {'esta_vencida', 'dias_restantes'}:
+            queryset = queryset.annotate(**anotaciones_vencimiento(hoy))
+        # Solo las columnas que se serializan (sin descripcion/observaciones)
+        return queryset.only(*{
+            columna
+            for campo in (campos or cls.Meta.fields)
+            if campo in cls.Meta.fields
+            for columna in cls.COLUMNAS.get(campo, [campo])
+        })
 
 
 class AsignarTareaSerializer(serializers.Serializer):
     """Serializer para asignar una tarea a personal"""
-    personal_id = serializers.IntegerField(required=True)
-    
-    def validate_personal_id(self, value):
-        from personal.models import Personal
-        try:
-            Personal.objects.get(id=value)
-        except Personal.DoesNotExist:
-            raise serializers.ValidationError("Personal no encontrado")
-        return value
+    # Valida y devuelve el Personal ya cargado (con su usuario, que usan la
+    # respuesta y las notificaciones): la vista no lo vuelve a buscar
+    personal_id = serializers.PrimaryKeyRelatedField(
+        queryset=Personal.objects.select_related('usuario'),
+        required=True,
+        error_messages={
+            'does_not_exist': 'Personal no encontrado',
+            'incorrect_type': 'Introduzca un número entero válido.',
+        },
+    )
 
 
 class CompletarTareaSerializer(serializers.Serializer):
@@ -253,11 +387,67 @@ class CancelarTareaSerializer(serializers.Serializer):
     )
 
 
-class ReportarIncidenciaSerializer(serializers.ModelSerializer):
+def _decodificar_imagen_base64(valor):
+    """Bytes y extensión de una imagen en base64 (con o sin prefijo data:image/...)"""
+    # Remover prefijo data:image/...;base64,
+    if ';base64,' in valor:
+        format_part, imgstr = valor.split(';base64,')
+        ext = format_part.split('/')[-1]
+        if ext not in ['jpeg', 'jpg', 'png', 'gif']:
+            ext = 'jpg'
+    else:
+        imgstr = valor
+        ext = 'jpg'
+    return base64.b64decode(imgstr), ext
+
+
+class BulkReportarIncidenciaSerializer(serializers.ListSerializer):
+    """
+    Reporte de varias incidencias en una sola petición: un INSERT para todas
+    las tareas y otro para sus registros de creación.
+    """
+    
+    def create(self, validated_data):
+        ahora = timezone.now()
+        tareas = []
+        for indice, datos in enumerate(validated_data):
+            imagen_base64 = datos.pop('imagen_base64', None)
+            tarea = TareaMantenimiento(**self.child.completar_datos(datos, ahora))
+            if imagen_base64 and not tarea.imagen_incidencia:
+                try:
+                    data, ext = _decodificar_imagen_base64(imagen_base64)
+                except ValueError:
+                    # Si falla la imagen, no bloquear la creación
+                    data = None
+                if data:
+                    # bulk_create guarda el archivo al insertar (pre_save del campo)
+                    tarea.imagen_incidencia = ContentFile(
+                        data, name=f'incidencia_{ahora.strftime("%Y%m%d_%H%M%S")}_{indice}.{ext}'
+                    )
+            tareas.append(tarea)
+        
+        with transaction.atomic():
+            TareaMantenimiento.objects.bulk_create(tareas)
+            RegistroMantenimiento.log_many(self.child.registro_creacion(tarea) for tarea in tareas)
+        
+        # bulk_create no envía post_save: las miniaturas y la invalidación
+        # de las estadísticas se hacen aquí
+        for tarea in tareas:
+            generar_miniatura(tarea)
+        transaction.on_commit(invalidar_cache_estadisticas)
+        return tareas
+
+
+class ReportarIncidenciaSerializer(CachedFieldsModelSerializer):
     """
     Serializer para que residentes reporten incidencias desde la app móvil.
     Crea automáticamente una tarea de mantenimiento tipo 'correctivo'.
     """
+    imagen_incidencia = serializers.ImageField(
+        required=False,
+        allow_null=True,
+        help_text='Imagen como archivo (multipart/form-data); preferida sobre imagen_base64'
+    )
     imagen_base64 = serializers.CharField(
         write_only=True,
         required=False,
@@ -272,7 +462,9 @@ class ReportarIncidenciaSerializer(serializers.ModelSerializer):
         source='get_estado_display',
         read_only=True
     )
-    residente_nombre = serializers.SerializerMethodField()
+    residente_nombre = serializers.CharField(
+        source='reportado_por_residente.nombre_completo', read_only=True, allow_null=True
+    )
     imagen_url = serializers.SerializerMethodField()
     
     class Meta:
@@ -299,39 +491,22 @@ class ReportarIncidenciaSerializer(serializers.ModelSerializer):
             'estado_display',
             'prioridad',
             'fecha_creacion',
-            'imagen_incidencia',
             'residente_nombre',
         ]
-    
-    def get_residente_nombre(self, obj):
-        if obj.reportado_por_residente:
-            return obj.reportado_por_residente.nombre_completo
-        return None
+        list_serializer_class = BulkReportarIncidenciaSerializer
     
     def get_imagen_url(self, obj):
         if obj.imagen_incidencia:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.imagen_incidencia.url)
-            return obj.imagen_incidencia.url
+            return url_absoluta(self.context, obj.imagen_incidencia.url)
         return None
     
     def validate_categoria_incidencia(self, value):
-        categorias_validas = [c[0] for c in TareaMantenimiento.CATEGORIA_INCIDENCIA_CHOICES]
-        if value not in categorias_validas:
-            raise serializers.ValidationError(
-                f"Categoría inválida. Opciones: {', '.join(categorias_validas)}"
-            )
+        if value not in _CATEGORIAS_VALIDAS:
+            raise serializers.ValidationError(_CATEGORIA_INVALIDA_MSG)
         return value
     
-    def create(self, validated_data):
-        import base64
-        from django.core.files.base import ContentFile
-        from django.utils import timezone
-        
-        # Extraer imagen base64 si existe
-        imagen_base64 = validated_data.pop('imagen_base64', None)
-        
+    def completar_datos(self, validated_data, ahora):
+        """Campos automáticos de una incidencia reportada por un residente"""
         # Obtener residente del contexto
         request = self.context.get('request')
         residente = None
@@ -344,45 +519,55 @@ class ReportarIncidenciaSerializer(serializers.ModelSerializer):
         validated_data['reportado_por_residente'] = residente
         validated_data['creado_por'] = request.user if request else None
         validated_data['prioridad'] = 'media'  # Prioridad por defecto
-        validated_data['fecha_limite'] = timezone.now().date() + timezone.timedelta(days=7)
-        
-        # Crear la tarea
-        tarea = TareaMantenimiento.objects.create(**validated_data)
+        validated_data['fecha_limite'] = ahora.date() + timezone.timedelta(days=7)
+        return validated_data
+    
+    def registro_creacion(self, tarea):
+        """Campos del registro de historial de una incidencia recién creada"""
+        request = self.context.get('request')
+        return {
+            'tarea': tarea,
+            'tipo_accion': 'creacion',
+            'descripcion': f'Incidencia reportada por residente: {tarea.titulo}',
+            'realizado_por': request.user if request else None,
+        }
+    
+    def create(self, validated_data):
+        # Una sola lectura del reloj para la fecha límite y el nombre del archivo
+        ahora = timezone.now()
         
-        # Procesar imagen base64 si existe
-        if imagen_base64:
-            try:
-                # Remover prefijo data:image/...;base64,
-                if ';base64,' in imagen_base64:
-                    format_part, imgstr = imagen_base64.split(';base64,')
-                    ext = format_part.split('/')[-1]
-                    if ext not in ['jpeg', 'jpg', 'png', 'gif']:
-                        ext = 'jpg'
-                else:
-                    imgstr = imagen_base64
-                    ext = 'jpg'
-                
-                # Decodificar y guardar
-                data = base64.b64decode(imgstr)
-                filename = f'incidencia_{tarea.id}_{timezone.now().strftime("%Y%m%d_%H%M%S")}.{ext}'
-                tarea.imagen_incidencia.save(filename, ContentFile(data), save=True)
-            except Exception as e:
-                # Si falla la imagen, no bloquear la creación
-                pass
+        # Extraer imagen base64 si existe (solo se usa si no llegó el archivo)
+        imagen_base64 = validated_data.pop('imagen_base64', None)
+        if validated_data.get('imagen_incidencia'):
+            imagen_base64 = None
         
-        # Crear registro de creación
-        from .models import RegistroMantenimiento
-        RegistroMantenimiento.objects.create(
-            tarea=tarea,
-            tipo_accion='creacion',
-            descripcion=f'Incidencia reportada por residente: {tarea.titulo}',
-            realizado_por=request.user if request else None
-        )
+        with transaction.atomic():
+            # Crear la tarea (con la imagen subida por multipart, si la hay)
+            tarea = TareaMantenimiento.objects.create(
+                **self.completar_datos(validated_data, ahora)
+            )
+            
+            # Procesar imagen base64 si existe
+            if imagen_base64:
+                try:
+                    # Decodificar y guardar; en su propio savepoint para que
+                    # un fallo no deje inutilizable la transacción de la tarea
+                    data, ext = _decodificar_imagen_base64(imagen_base64)
+                    filename = f'incidencia_{tarea.id}_{ahora.strftime("%Y%m%d_%H%M%S")}.{ext}'
+                    with transaction.atomic():
+                        tarea.imagen_incidencia.save(filename, ContentFile(data), save=True)
+                except (ValueError, OSError):
+                    # Base64 inválido o error de almacenamiento: no bloquear
+                    # la creación
+                    pass
+            
+            # Crear registro de creación (en la misma transacción que la tarea)
+            RegistroMantenimiento.objects.create(**self.registro_creacion(tarea))
         
         return tarea
 
 
-class MisIncidenciasSerializer(serializers.ModelSerializer):
+class MisIncidenciasSerializer(CachedFieldsModelSerializer):
     """
     Serializer para listar las incidencias reportadas por un residente.
     """
@@ -421,8 +606,5 @@ class MisIncidenciasSerializer(serializers.ModelSerializer):
     
     def get_imagen_url(self, obj):
         if obj.imagen_incidencia:
-            request = self.context.get('request')
-            if request:
-                return request.build_absolute_uri(obj.imagen_incidencia.url)
-            return obj.imagen_incidencia.url
+            return url_absoluta(self.context, obj.imagen_incidencia.url)
         return None
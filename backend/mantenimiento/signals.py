@@ -1,11 +1,62 @@
 """
 Signals para el módulo de mantenimiento.
-Crea notificaciones automáticas cuando se asignan o completan tareas.
+Crea notificaciones automáticas cuando se asignan o completan tareas
+y genera la miniatura de las fotos de incidencias.
 """
-from django.db.models.signals import post_save, pre_save
+import os
+import threading
+from contextlib import contextmanager
+from io import BytesIO
+
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from .models import TareaMantenimiento, RegistroMantenimiento
 from notificaciones.models import Notificacion
+from .cache import invalidar_cache_estadisticas
+
+
+# Lote de notificaciones abierto por notificaciones_en_lote() en este hilo
+_lote = threading.local()
+
+
+@contextmanager
+def notificaciones_en_lote():
+    """
+    Acumula las notificaciones que crean las señales dentro del bloque y las
+    inserta con un solo bulk_create al salir. Usar dentro de la transacción
+    de los cambios: si el bloque lanza una excepción, se descartan.
+    """
+    anterior = getattr(_lote, 'notificaciones', None)
+    _lote.notificaciones = pendientes = []
+    try:
+        yield
+    finally:
+        _lote.notificaciones = anterior
+    Notificacion.objects.bulk_create(pendientes)
+
+
+def _encolar_notificacion(usuario_id, titulo, mensaje):
+    """
+    Crea una notificación individual para `usuario_id`, en la misma
+    transacción que el cambio de la tarea. Dentro de notificaciones_en_lote()
+    se agrega al lote en lugar de insertarse de inmediato.
+    """
+    notificacion = Notificacion(
+        nombre=titulo,
+        descripcion=mensaje,
+        tipo='mantenimiento',
+        estado='enviada',
+        es_individual=True,
+        usuario_destinatario_id=usuario_id,
+    )
+    pendientes = getattr(_lote, 'notificaciones', None)
+    if pendientes is not None:
+        pendientes.append(notificacion)
+    else:
+        notificacion.save()
 
 
 @receiver(post_save, sender=TareaMantenimiento)
@@ -13,27 +64,28 @@ def notificar_asignacion_tarea(sender, instance, created, **kwargs):
     """
     Crea notificación cuando se asigna una tarea a personal.
     """
+    # Solo tareas nuevas (las reasignaciones se manejan en pre_save); se
+    # revisa antes de tocar las relaciones para no cargarlas en cada save()
+    if not created:
+        return
+    
     # Solo notificar si la tarea tiene personal asignado
-    if not instance.personal_asignado:
+    if not instance.personal_asignado_id:
         return
     
     # Verificar si el personal tiene usuario asociado
-    if not instance.personal_asignado.usuario:
+    if not instance.personal_asignado.usuario_id:
         return
     
-    # Si la tarea acaba de ser creada y tiene personal asignado
-    if created and instance.personal_asignado:
-        Notificacion.objects.create(
-            usuario=instance.personal_asignado.usuario,
-            tipo='tarea_asignada',
-            titulo='Nueva tarea de mantenimiento asignada',
-            mensaje=f'Se te ha asignado la tarea: {instance.titulo}. Prioridad: {instance.get_prioridad_display()}. Fecha límite: {instance.fecha_limite.strftime("%d/%m/%Y")}',
-            link=f'/admin/mantenimiento/{instance.id}',
-        )
+    _encolar_notificacion(
+        instance.personal_asignado.usuario_id,
+        titulo='Nueva tarea de mantenimiento asignada',
+        mensaje=f'Se te ha asignado la tarea: {instance.titulo}. Prioridad: {instance.get_prioridad_display()}. Fecha límite: {instance.fecha_limite.strftime("%d/%m/%Y")}',
+    )
 
 
 @receiver(pre_save, sender=TareaMantenimiento)
-def notificar_cambios_tarea(sender, instance, **kwargs):
+def notificar_cambios_tarea(sender, instance, update_fields=None, **kwargs):
     """
     Notifica al personal cuando cambia el estado de su tarea.
     """
@@ -41,58 +93,111 @@ def notificar_cambios_tarea(sender, instance, **kwargs):
     if not instance.pk:
         return
     
-    # Obtener el estado anterior
-    try:
-        tarea_anterior = TareaMantenimiento.objects.get(pk=instance.pk)
-    except TareaMantenimiento.DoesNotExist:
+    # Guardado parcial que no toca ni el estado ni el personal
+    if update_fields is not None and not update_fields & {
+        'estado', 'personal_asignado', 'personal_asignado_id'
+    }:
         return
     
+    # Valores anteriores: los que se leyeron de la BD (from_db) o, si la
+    # instancia no se cargó completa, una consulta de solo esos campos
+    anterior = getattr(instance, '_valores_originales', None)
+    if anterior is None:
+        try:
+            anterior = TareaMantenimiento.objects.values(
+                *TareaMantenimiento.CAMPOS_SEGUIDOS
+            ).get(pk=instance.pk)
+        except TareaMantenimiento.DoesNotExist:
+            return
+    
     # Si cambió el personal asignado (reasignación)
-    if (tarea_anterior.personal_asignado != instance.personal_asignado and 
-        instance.personal_asignado and 
-        instance.personal_asignado.usuario):
+    if (anterior['personal_asignado_id'] != instance.personal_asignado_id and 
+        instance.personal_asignado_id and 
+        instance.personal_asignado.usuario_id):
         
-        Notificacion.objects.create(
-            usuario=instance.personal_asignado.usuario,
-            tipo='tarea_reasignada',
+        _encolar_notificacion(
+            instance.personal_asignado.usuario_id,
             titulo='Tarea reasignada a ti',
             mensaje=f'Se te ha reasignado la tarea: {instance.titulo}. Fecha límite: {instance.fecha_limite.strftime("%d/%m/%Y")}',
-            link=f'/admin/mantenimiento/{instance.id}',
         )
     
     # Si la tarea se completó
-    if (tarea_anterior.estado != 'completada' and 
+    if (anterior['estado'] != 'completada' and 
         instance.estado == 'completada' and 
-        instance.creado_por):
+        instance.creado_por_id):
         
-        Notificacion.objects.create(
-            usuario=instance.creado_por,
-            tipo='tarea_completada',
+        _encolar_notificacion(
+            instance.creado_por_id,
             titulo='Tarea de mantenimiento completada',
             mensaje=f'La tarea "{instance.titulo}" ha sido completada por {instance.personal_asignado.nombre_completo if instance.personal_asignado else "el sistema"}.',
-            link=f'/admin/mantenimiento/{instance.id}',
         )
     
     # Si la tarea se canceló
-    if (tarea_anterior.estado != 'cancelada' and 
+    if (anterior['estado'] != 'cancelada' and 
         instance.estado == 'cancelada'):
         
         # Notificar al personal asignado (si existe)
-        if instance.personal_asignado and instance.personal_asignado.usuario:
-            Notificacion.objects.create(
-                usuario=instance.personal_asignado.usuario,
-                tipo='tarea_cancelada',
+        if instance.personal_asignado_id and instance.personal_asignado.usuario_id:
+            _encolar_notificacion(
+                instance.personal_asignado.usuario_id,
                 titulo='Tarea cancelada',
                 mensaje=f'La tarea "{instance.titulo}" ha sido cancelada.',
-                link=f'/admin/mantenimiento/{instance.id}',
             )
         
         # Notificar al creador
-        if instance.creado_por:
-            Notificacion.objects.create(
-                usuario=instance.creado_por,
-                tipo='tarea_cancelada',
+        if instance.creado_por_id:
+            _encolar_notificacion(
+                instance.creado_por_id,
                 titulo='Tarea de mantenimiento cancelada',
                 mensaje=f'La tarea "{instance.titulo}" ha sido cancelada.',
-                link=f'/admin/mantenimiento/{instance.id}',
             )
+
+
+@receiver([post_save, post_delete], sender=TareaMantenimiento)
+def invalidar_estadisticas_tareas(sender, **kwargs):
+    """Fuerza el recálculo de las estadísticas una vez confirmado el cambio"""
+    transaction.on_commit(invalidar_cache_estadisticas)
+
+
+MINIATURA_TAMANO = (300, 200)
+
+
+@receiver(post_save, sender=TareaMantenimiento)
+def generar_miniatura_incidencia(sender, instance, update_fields=None, **kwargs):
+    """
+    Genera una miniatura de la foto de la incidencia para el admin, en lugar
+    de descargar la imagen original en cada vista previa.
+    """
+    if update_fields is not None and 'imagen_incidencia' not in update_fields:
+        return
+    generar_miniatura(instance)
+
+
+def generar_miniatura(instance):
+    """Crea (o quita) la miniatura según la imagen actual de la tarea"""
+    imagen = instance.imagen_incidencia
+    miniatura = instance.imagen_incidencia_thumb
+    
+    if not imagen:
+        if miniatura:
+            TareaMantenimiento.objects.filter(pk=instance.pk).update(imagen_incidencia_thumb=None)
+        return
+    
+    # Ya existe una miniatura de esta misma imagen
+    base = os.path.splitext(os.path.basename(imagen.name))[0]
+    if miniatura and os.path.basename(miniatura.name).startswith(f'{base}_thumb'):
+        return
+    
+    try:
+        with imagen.open('rb') as archivo:
+            img = Image.open(archivo)
+            img.thumbnail(MINIATURA_TAMANO)
+            buffer = BytesIO()
+            img.convert('RGB').save(buffer, format='JPEG', quality=80, optimize=True)
+    except (OSError, ValueError):
+        # Si la imagen no se puede procesar, el admin usa la original
+        return
+    
+    miniatura.save(f'{base}_thumb.jpg', ContentFile(buffer.getvalue()), save=False)
+    # update() para no volver a disparar las señales de guardado
+    TareaMantenimiento.objects.filter(pk=instance.pk).update(imagen_incidencia_thumb=miniatura.name)
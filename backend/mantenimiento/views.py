@@ -6,10 +6,14 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django_filters.rest_framework import DjangoFilterBackend
+from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from django.db.models import Q, Sum, Count
+from collections import Counter
 from decimal import Decimal
 
+from .cache import clave_estadisticas
 from .models import TareaMantenimiento, RegistroMantenimiento, MaterialInsumo
 from .serializers import (
     TareaMantenimientoSerializer,
@@ -22,7 +26,6 @@ from .serializers import (
     ReportarIncidenciaSerializer,
     MisIncidenciasSerializer,
 )
-from personal.models import Personal
 
 
 class TareaMantenimientoViewSet(viewsets.ModelViewSet):
@@ -30,12 +33,7 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
     ViewSet para gestionar tareas de mantenimiento.
     Incluye filtros, búsqueda y acciones personalizadas.
     """
-    queryset = TareaMantenimiento.objects.select_related(
-        'personal_asignado',
-        'area_comun',
-        'creado_por',
-        'reportado_por_residente'
-    ).prefetch_related('registros', 'materiales')
+    queryset = TareaMantenimiento.objects.all()
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['tipo', 'estado', 'prioridad', 'personal_asignado', 'area_comun', 'es_incidencia', 'categoria_incidencia']
@@ -43,12 +41,27 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
     ordering_fields = ['fecha_creacion', 'fecha_limite', 'prioridad', 'estado']
     ordering = ['-fecha_creacion']
     
+    # Acciones que cambian el estado y agregan un registro al historial
+    ACCIONES_CON_REGISTRO = frozenset({'asignar', 'iniciar', 'completar', 'cancelar'})
+    
     def get_serializer_class(self):
         """Usa serializer ligero para listados"""
         if self.action == 'list':
             return TareaMantenimientoListSerializer
         return TareaMantenimientoSerializer
     
+    def campos_solicitados(self):
+        """Campos pedidos con ?fields= en lecturas; None = respuesta completa"""
+        if self.request.method not in ('GET', 'HEAD'):
+            return None
+        return self.get_serializer_class().campos_solicitados(self.request)
+    
+    def get_serializer(self, *args, **kwargs):
+        campos = self.campos_solicitados()
+        if campos is not None:
+            kwargs.setdefault('fields', campos)
+        return super().get_serializer(*args, **kwargs)
+    
     def get_queryset(self):
         """
         Filtros adicionales por query params:
@@ -56,15 +69,28 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
         - personal: ID del personal (alias de personal_asignado)
         - desde: fecha_desde (YYYY-MM-DD)
         - hasta: fecha_hasta (YYYY-MM-DD)
+        - fields: campos a devolver (ej: id,titulo,estado)
         """
         queryset = super().get_queryset()
+        # Una sola fecha de referencia para anotaciones y filtros
+        hoy = timezone.now().date()
+        
+        # Relaciones según el serializer de la acción y los campos pedidos (evita N+1);
+        # estadisticas solo agrega, no serializa tareas
+        serializer_class = self.get_serializer_class()
+        if self.action != 'estadisticas' and hasattr(serializer_class, 'setup_eager_loading'):
+            campos = self.campos_solicitados()
+            if self.action in self.ACCIONES_CON_REGISTRO:
+                # El historial se carga al serializar la respuesta, ya con el
+                # registro que agrega la acción (ver _respuesta_accion)
+                campos = set(serializer_class.Meta.fields) - {'registros'}
+            queryset = serializer_class.setup_eager_loading(queryset, campos, hoy=hoy)
         
         # Filtro por tareas vencidas
         vencidas = self.request.query_params.get('vencidas')
         if vencidas == 'true':
-            queryset = queryset.vencidas()
+            queryset = queryset.vencidas(hoy)
         elif vencidas == 'false':
-            hoy = timezone.now().date()
             queryset = queryset.filter(
                 Q(fecha_limite__gte=hoy) | Q(estado__in=['completada', 'cancelada'])
             )
@@ -95,14 +121,25 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
             descripcion=f'Tarea creada: {tarea.titulo}',
             realizado_por=self.request.user
         )
+        
+        # La respuesta necesita las anotaciones (creado_por_nombre, ...); sin
+        # los filtros de listado de get_queryset, que pueden excluir la tarea
+        serializer.instance = TareaMantenimientoSerializer.setup_eager_loading(
+            TareaMantenimiento.objects.filter(pk=tarea.pk)
+        ).get()
     
     def perform_update(self, serializer):
         """Crea registro de actualización"""
-        tarea_anterior = self.get_object()
-        estado_anterior = tarea_anterior.estado
+        # DRF ya cargó la instancia en update(); se lee antes de que save() la modifique
+        estado_anterior = serializer.instance.estado
         
         tarea = serializer.save()
         
+        # Como DRF con _prefetched_objects_cache: la respuesta recarga las
+        # listas precargadas (incluye el registro que se crea abajo)
+        tarea.__dict__.pop('registros_cache', None)
+        tarea.__dict__.pop('materiales_cache', None)
+        
         # Si cambió el estado, crear registro
         if estado_anterior != tarea.estado:
             RegistroMantenimiento.objects.create(
@@ -124,36 +161,26 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
         serializer = AsignarTareaSerializer(data=request.data)
         
         if serializer.is_valid():
-            personal_id = serializer.validated_data['personal_id']
-            try:
-                personal = Personal.objects.get(id=personal_id)
-                personal_anterior = tarea.personal_asignado
-                
-                # Asignar tarea
-                tarea.asignar_a(personal, request.user)
-                
-                # Crear registro
-                descripcion = f'Tarea asignada a {personal.nombre_completo}'
-                if personal_anterior:
-                    descripcion = f'Tarea reasignada de {personal_anterior.nombre_completo} a {personal.nombre_completo}'
-                
-                RegistroMantenimiento.objects.create(
-                    tarea=tarea,
-                    tipo_accion='asignacion',
-                    descripcion=descripcion,
-                    realizado_por=request.user
-                )
-                
-                return Response({
-                    'success': True,
-                    'message': 'Tarea asignada correctamente',
-                    'tarea': TareaMantenimientoSerializer(tarea).data
-                })
-            except Personal.DoesNotExist:
-                return Response(
-                    {'error': 'Personal no encontrado'},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+            # El serializer ya resolvió el Personal
+            personal = serializer.validated_data['personal_id']
+            personal_anterior = tarea.personal_asignado
+            
+            # Asignar tarea
+            tarea.asignar_a(personal, request.user)
+            
+            # Crear registro
+            descripcion = f'Tarea asignada a {personal.nombre_completo}'
+            if personal_anterior:
+                descripcion = f'Tarea reasignada de {personal_anterior.nombre_completo} a {personal.nombre_completo}'
+            
+            RegistroMantenimiento.objects.create(
+                tarea=tarea,
+                tipo_accion='asignacion',
+                descripcion=descripcion,
+                realizado_por=request.user
+            )
+            
+            return self._respuesta_accion(tarea, 'Tarea asignada correctamente')
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -172,11 +199,7 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
                 estado_nuevo='en_progreso'
             )
             
-            return Response({
-                'success': True,
-                'message': 'Tarea iniciada correctamente',
-                'tarea': TareaMantenimientoSerializer(tarea).data
-            })
+            return self._respuesta_accion(tarea, 'Tarea iniciada correctamente')
         
         return Response(
             {'error': 'No se puede iniciar esta tarea. Verifica su estado actual.'},
@@ -210,11 +233,7 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
                     estado_nuevo='completada'
                 )
                 
-                return Response({
-                    'success': True,
-                    'message': 'Tarea completada correctamente',
-                    'tarea': TareaMantenimientoSerializer(tarea).data
-                })
+                return self._respuesta_accion(tarea, 'Tarea completada correctamente')
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -241,66 +260,87 @@ class TareaMantenimientoViewSet(viewsets.ModelViewSet):
                     estado_nuevo='cancelada'
                 )
                 
-                return Response({
-                    'success': True,
-                    'message': 'Tarea cancelada correctamente',
-                    'tarea': TareaMantenimientoSerializer(tarea).data
-                })
+                return self._respuesta_accion(tarea, 'Tarea cancelada correctamente')
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
+    def _respuesta_accion(self, tarea, mensaje):
+        """Respuesta común de las acciones de estado, con la tarea actualizada"""
+        return Response({
+            'success': True,
+            'message': mensaje,
+            'tarea': TareaMantenimientoSerializer(tarea).data
+        })
+    
     @action(detail=False, methods=['get'])
     def estadisticas(self, request):
         """
         Retorna estadísticas generales de mantenimiento.
+        Se cachean por combinación de filtros durante
+        MANTENIMIENTO_ESTADISTICAS_CACHE_TIMEOUT segundos; cualquier cambio
+        en las tareas las invalida (ver signals).
+        """
+        datos = cache.get_or_set(
+            clave_estadisticas(request.query_params),
+            self._calcular_estadisticas,
+            settings.MANTENIMIENTO_ESTADISTICAS_CACHE_TIMEOUT
+        )
+        return Response(datos)
+    
+    def _calcular_estadisticas(self):
+        """
+        Estadísticas de las tareas filtradas por get_queryset(), en dos consultas:
+        los conteos por estado/tipo/prioridad salen de un único GROUP BY sobre
+        las tres columnas (pocas combinaciones) y el resto de un solo aggregate().
         """
         queryset = self.get_queryset()
+        ahora = timezone.now()
         
-        # Estadísticas por estado
-        por_estado = queryset.values('estado').annotate(
-            total=Count('id')
-        ).order_by('estado')
-        
-        # Estadísticas por tipo
-        por_tipo = queryset.values('tipo').annotate(
-            total=Count('id')
-        ).order_by('tipo')
+        por_estado, por_tipo, por_prioridad = Counter(), Counter(), Counter()
+        combinaciones = queryset.order_by().values_list(
+            'estado', 'tipo', 'prioridad'
+        ).annotate(total=Count('id'))
+        for estado, tipo, prioridad, total in combinaciones:
+            por_estado[estado] += total
+            por_tipo[tipo] += total
+            por_prioridad[prioridad] += total
         
-        # Estadísticas por prioridad
-        por_prioridad = queryset.values('prioridad').annotate(
-            total=Count('id')
-        ).order_by('prioridad')
-        
-        # Costos
-        costos = queryset.aggregate(
+        # Costos y conteos en una sola pasada
+        # (vencidas y del mes: mismos criterios que el manager)
+        resumen = queryset.aggregate(
             presupuesto_total=Sum('presupuesto_estimado'),
-            costo_total=Sum('costo_real')
+            costo_total=Sum('costo_real'),
+            tareas_vencidas=Count('id', filter=Q(
+                estado__in=['pendiente', 'en_progreso'],
+                fecha_limite__lt=ahora.date()
+            )),
+            tareas_mes=Count('id', filter=Q(
+                fecha_creacion__year=ahora.year,
+                fecha_creacion__month=ahora.month
+            )),
         )
         
-        # Tareas vencidas
-        tareas_vencidas = queryset.vencidas().count()
-        
-        # Tareas del mes actual
-        tareas_mes = queryset.del_mes().count()
-        
-        return Response({
-            'por_estado': list(por_estado),
-            'por_tipo': list(por_tipo),
-            'por_prioridad': list(por_prioridad),
-            'costos': costos,
-            'tareas_vencidas': tareas_vencidas,
-            'tareas_mes': tareas_mes,
-            'total_tareas': queryset.count()
-        })
+        return {
+            'por_estado': [{'estado': k, 'total': v} for k, v in sorted(por_estado.items())],
+            'por_tipo': [{'tipo': k, 'total': v} for k, v in sorted(por_tipo.items())],
+            'por_prioridad': [{'prioridad': k, 'total': v} for k, v in sorted(por_prioridad.items())],
+            'costos': {
+                'presupuesto_total': resumen['presupuesto_total'],
+                'costo_total': resumen['costo_total'],
+            },
+            'tareas_vencidas': resumen['tareas_vencidas'],
+            'tareas_mes': resumen['tareas_mes'],
+            # Cada tarea cae en exactamente un estado: el total ya está en memoria
+            'total_tareas': sum(por_estado.values()),
+        }
 
 
 class RegistroMantenimientoViewSet(viewsets.ReadOnlyModelViewSet):
     """
     ViewSet de solo lectura para registros de mantenimiento.
     """
-    queryset = RegistroMantenimiento.objects.select_related(
-        'tarea',
-        'realizado_por'
+    queryset = RegistroMantenimientoSerializer.setup_eager_loading(
+        RegistroMantenimiento.objects.all()
     )
     serializer_class = RegistroMantenimientoSerializer
     permission_classes = [IsAuthenticated]
@@ -329,12 +369,20 @@ class IncidenciaViewSet(viewsets.GenericViewSet):
     ViewSet para que residentes reporten y consulten incidencias desde la app móvil.
     """
     permission_classes = [IsAuthenticated]
+    # Incidencias aceptadas por petición en /incidencias/bulk/
+    MAX_INCIDENCIAS_POR_LOTE = 20
     
     def get_serializer_class(self):
-        if self.action == 'reportar':
+        if self.action in ('reportar', 'reportar_lote'):
             return ReportarIncidenciaSerializer
         return MisIncidenciasSerializer
     
+    def get_serializer_context(self):
+        """Agrega el prefijo de las URLs absolutas, calculado una vez por respuesta"""
+        context = super().get_serializer_context()
+        context['prefijo_url'] = self.request.build_absolute_uri('/').rstrip('/')
+        return context
+    
     def get_queryset(self):
         """Retorna solo las incidencias del residente actual"""
         user = self.request.user
@@ -360,7 +408,7 @@ class IncidenciaViewSet(viewsets.GenericViewSet):
         """
         serializer = ReportarIncidenciaSerializer(
             data=request.data,
-            context={'request': request}
+            context=self.get_serializer_context()
         )
         
         if serializer.is_valid():
@@ -368,7 +416,43 @@ class IncidenciaViewSet(viewsets.GenericViewSet):
             return Response({
                 'success': True,
                 'message': 'Incidencia reportada correctamente. El equipo de mantenimiento será notificado.',
-                'data': MisIncidenciasSerializer(incidencia, context={'request': request}).data
+                'data': MisIncidenciasSerializer(incidencia, context=self.get_serializer_context()).data
+            }, status=status.HTTP_201_CREATED)
+        
+        return Response({
+            'success': False,
+            'error': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def reportar_lote(self, request):
+        """
+        Reportar varias incidencias en una sola petición (por ejemplo, varias fotos).
+        Body: lista con el mismo formato que /reportar/ (máximo MAX_INCIDENCIAS_POR_LOTE)
+        [
+            {"titulo": "...", "descripcion": "...", "categoria_incidencia": "plomeria", ...},
+            {"titulo": "...", "descripcion": "...", "categoria_incidencia": "electricidad", ...}
+        ]
+        """
+        serializer = ReportarIncidenciaSerializer(
+            data=request.data,
+            many=True,
+            min_length=1,
+            max_length=self.MAX_INCIDENCIAS_POR_LOTE,
+            context=self.get_serializer_context()
+        )
+        
+        if serializer.is_valid():
+            incidencias = serializer.save()
+            return Response({
+                'success': True,
+                'message': f'{len(incidencias)} incidencia(s) reportada(s) correctamente. El equipo de mantenimiento será notificado.',
+                'count': len(incidencias),
+                'results': MisIncidenciasSerializer(
+                    incidencias,
+                    many=True,
+                    context=self.get_serializer_context()
+                ).data
             }, status=status.HTTP_201_CREATED)
         
         return Response({
@@ -395,7 +479,7 @@ class IncidenciaViewSet(viewsets.GenericViewSet):
         serializer = MisIncidenciasSerializer(
             queryset,
             many=True,
-            context={'request': request}
+            context=self.get_serializer_context()
         )
         
         return Response({
@@ -413,7 +497,7 @@ class IncidenciaViewSet(viewsets.GenericViewSet):
             incidencia = self.get_queryset().get(pk=pk)
             serializer = MisIncidenciasSerializer(
                 incidencia,
-                context={'request': request}
+                context=self.get_serializer_context()
             )
             return Response({
                 'success': True,
@@ -1,9 +1,44 @@
 """
 Configuración del admin para multas.
 """
+from functools import lru_cache
+
 from django.contrib import admin
+from django.db import transaction
+from django.db.models import TextField, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
 from django.utils.html import format_html
-from .models import Multa
+from .models import Multa, anotacion_dias_vencimiento, anotacion_residente_nombre
+from core.dashboard_views import invalidar_cache_dashboard
+
+
+# Colores y etiquetas de los badges, construidos una sola vez por proceso
+_TIPO_COLORS = {
+    'ruido': '#e74c3c',
+    'estacionamiento': '#3498db',
+    'area_comun': '#9b59b6',
+    'pago_atrasado': '#e67e22',
+    'dano_propiedad': '#c0392b',
+    'incumplimiento': '#34495e',
+    'otro': '#95a5a6',
+}
+_ESTADO_COLORS = {
+    'pendiente': '#f39c12',
+    'pagado': '#27ae60',
+    'cancelado': '#95a5a6',
+    'en_disputa': '#e74c3c',
+}
+_TIPO_LABELS = dict(Multa.TIPO_CHOICES)
+_ESTADO_LABELS = dict(Multa.ESTADO_CHOICES)
+
+_BADGE_HTML = '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px; font-weight: bold;">{}</span>'
+
+
+@lru_cache(maxsize=32)
+def _badge(color, label):
+    """HTML del badge; los pares (color, etiqueta) son finitos y se memorizan"""
+    return format_html(_BADGE_HTML, color, label)
 
 
 @admin.register(Multa)
@@ -82,36 +117,17 @@ class MultaAdmin(admin.ModelAdmin):
     
     def tipo_badge(self, obj):
         """Badge coloreado para tipo"""
-        colors = {
-            'ruido': '#e74c3c',
-            'estacionamiento': '#3498db',
-            'area_comun': '#9b59b6',
-            'pago_atrasado': '#e67e22',
-            'dano_propiedad': '#c0392b',
-            'incumplimiento': '#34495e',
-            'otro': '#95a5a6',
-        }
-        color = colors.get(obj.tipo, '#95a5a6')
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px; font-weight: bold;">{}</span>',
-            color,
-            obj.get_tipo_display()
+        return _badge(
+            _TIPO_COLORS.get(obj.tipo, '#95a5a6'),
+            _TIPO_LABELS.get(obj.tipo, obj.tipo)
         )
     tipo_badge.short_description = 'Tipo'
     
     def estado_badge(self, obj):
         """Badge coloreado para estado"""
-        colors = {
-            'pendiente': '#f39c12',
-            'pagado': '#27ae60',
-            'cancelado': '#95a5a6',
-            'en_disputa': '#e74c3c',
-        }
-        color = colors.get(obj.estado, '#95a5a6')
-        return format_html(
-            '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px; font-weight: bold;">{}</span>',
-            color,
-            obj.get_estado_display()
+        return _badge(
+            _ESTADO_COLORS.get(obj.estado, '#95a5a6'),
+            _ESTADO_LABELS.get(obj.estado, obj.estado)
         )
     estado_badge.short_description = 'Estado'
     
@@ -120,24 +136,25 @@ class MultaAdmin(admin.ModelAdmin):
         if obj.estado != 'pendiente':
             return '-'
         
-        if obj.esta_vencida:
-            dias = abs(obj.dias_vencimiento)
+        # Días hasta el vencimiento calculados en la consulta (get_queryset)
+        dias = obj._dias_restantes.days
+        if dias < 0:
             return format_html(
                 '<span style="background-color: #e74c3c; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px; font-weight: bold;">Vencida hace {} días</span>',
-                dias
+                abs(dias)
             )
+        
+        if dias <= 7:
+            color = '#f39c12'
         else:
-            dias = obj.dias_vencimiento
-            if dias <= 7:
-                color = '#f39c12'
-            else:
-                color = '#27ae60'
-            return format_html(
-                '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px; font-weight: bold;">Vence en {} días</span>',
-                color,
-                dias
-            )
+            color = '#27ae60'
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px; font-size: 11px; font-weight: bold;">Vence en {} días</span>',
+            color,
+            dias
+        )
     vencimiento_badge.short_description = 'Vencimiento'
+    vencimiento_badge.admin_order_field = '_dias_restantes'
     
     def monto_display(self, obj):
         """Muestra monto total con recargos"""
@@ -153,16 +170,27 @@ class MultaAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         """Optimizar queries"""
         qs = super().get_queryset(request)
-        return qs.select_related('residente', 'unidad')
+        return qs.select_related('residente', 'unidad').annotate(
+            _dias_restantes=anotacion_dias_vencimiento(),
+            _residente_nombre=anotacion_residente_nombre(),
+        )
     
     actions = ['marcar_como_pagadas', 'cancelar_multas']
     
+    # Las acciones usan un solo UPDATE en lugar de save() por multa: no se
+    # ejecutan save() ni las señales, por eso fijan fecha_actualizacion e
+    # invalidan el dashboard a mano (mismo efecto que marcar_como_pagado/cancelar)
+    
     def marcar_como_pagadas(self, request, queryset):
         """Acción para marcar multas como pagadas"""
-        count = 0
-        for multa in queryset.filter(estado='pendiente'):
-            multa.marcar_como_pagado()
-            count += 1
+        ahora = timezone.now()
+        count = queryset.filter(estado='pendiente').update(
+            estado='pagado',
+            fecha_pago=ahora.date(),
+            fecha_actualizacion=ahora
+        )
+        if count:
+            transaction.on_commit(invalidar_cache_dashboard)
         
         self.message_user(
             request,
@@ -172,10 +200,16 @@ class MultaAdmin(admin.ModelAdmin):
     
     def cancelar_multas(self, request, queryset):
         """Acción para cancelar multas"""
-        count = 0
-        for multa in queryset.filter(estado='pendiente'):
-            multa.cancelar('Cancelado desde admin')
-            count += 1
+        count = queryset.filter(estado='pendiente').update(
+            estado='cancelado',
+            observaciones=Concat(
+                'observaciones', Value('\n[Cancelado] Cancelado desde admin'),
+                output_field=TextField()
+            ),
+            fecha_actualizacion=timezone.now()
+        )
+        if count:
+            transaction.on_commit(invalidar_cache_dashboard)
         
         self.message_user(
             request,
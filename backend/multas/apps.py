@@ -5,3 +5,6 @@ class MultasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'multas'
     verbose_name = 'Multas'
+
+    def ready(self):
+        import multas.signals  # noqa
@@ -0,0 +1,19 @@
+# Generated by Django 5.0.7 on 2026-10-15 02:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('multas', '0001_initial'),
+        ('residentes', '0007_residente_foto_perfil'),
+        ('unidades', '0002_add_codigo_field'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='multa',
+            index=models.Index(fields=['fecha_emision'], name='multas_fecha_e_e0aaa4_idx'),
+        ),
+    ]
@@ -1,11 +1,49 @@
 from django.db import models
+from django.db.models.functions import Coalesce, Concat, NullIf, Trim
 from django.core.validators import MinValueValidator
 from django.utils import timezone
+from datetime import timedelta
 from decimal import Decimal
 from residentes.models import Residente
 from unidades.models import UnidadHabitacional
 
 
+def anotacion_dias_vencimiento(hoy=None):
+    """
+    Expresión SQL de los días hasta fecha_vencimiento (intervalo), para
+    annotate(_dias_restantes=...): la fecha actual se lee una sola vez.
+    """
+    if hoy is None:
+        hoy = timezone.now().date()
+    return models.ExpressionWrapper(
+        models.F('fecha_vencimiento') - models.Value(hoy, output_field=models.DateField()),
+        output_field=models.DurationField()
+    )
+
+
+def anotacion_residente_nombre():
+    """
+    Expresión SQL equivalente a Multa.residente_nombre, para
+    annotate(_residente_nombre=...): evita cargar residente y usuario por fila.
+    """
+    return models.Case(
+        # Con usuario: usuario.get_full_name()
+        models.When(
+            residente__usuario__isnull=False,
+            then=Trim(Concat(
+                'residente__usuario__first_name', models.Value(' '), 'residente__usuario__last_name'
+            )),
+        ),
+        # Sin usuario: str(residente)
+        default=Concat(
+            Trim(Concat('residente__nombre', models.Value(' '), 'residente__apellido')),
+            models.Value(' - '),
+            Coalesce(NullIf('residente__unidad_habitacional', models.Value('')), models.Value('Sin unidad')),
+        ),
+        output_field=models.CharField(),
+    )
+
+
 class MultaManager(models.Manager):
     """Manager personalizado para Multa"""
     
@@ -13,9 +51,13 @@ class MultaManager(models.Manager):
         """Retorna multas pendientes de pago"""
         return self.filter(estado='pendiente')
     
-    def vencidas(self):
-        """Retorna multas pendientes que ya vencieron"""
-        hoy = timezone.now().date()
+    def vencidas(self, hoy=None):
+        """
+        Retorna multas pendientes que ya vencieron.
+        hoy: fecha de referencia, para reutilizar la misma en varias consultas.
+        """
+        if hoy is None:
+            hoy = timezone.now().date()
         return self.filter(
             estado='pendiente',
             fecha_vencimiento__lt=hoy
@@ -141,6 +183,13 @@ class Multa(models.Model):
             models.Index(fields=['estado', 'fecha_vencimiento']),
             models.Index(fields=['residente', 'estado']),
             models.Index(fields=['tipo']),
+            models.Index(fields=['fecha_emision']),
+            # Índice parcial para pendientes()/vencidas(): solo multas pendientes
+            models.Index(
+                fields=['fecha_vencimiento', 'residente'],
+                condition=models.Q(estado='pendiente'),
+                name='multa_pend_vto_res_idx',
+            ),
         ]
     
     def __str__(self):
@@ -148,28 +197,54 @@ class Multa(models.Model):
     
     def save(self, *args, **kwargs):
         """Override save para setear fecha de vencimiento y unidad automáticamente"""
+        hoy = timezone.now().date()
+        # Con update_fields solo se calculan los campos que este save() va a escribir
+        update_fields = kwargs.get('update_fields')
+        campos = None if update_fields is None else set(update_fields)
+        
         # Si no tiene fecha de vencimiento, setear 30 días después de emisión
-        if not self.fecha_vencimiento:
-            if self.fecha_emision:
-                from datetime import timedelta
-                self.fecha_vencimiento = self.fecha_emision + timedelta(days=30)
-            else:
-                from datetime import timedelta
-                self.fecha_vencimiento = timezone.now().date() + timedelta(days=30)
+        if not self.fecha_vencimiento and (campos is None or 'fecha_vencimiento' in campos):
+            self.fecha_vencimiento = (self.fecha_emision or hoy) + timedelta(days=30)
         
         # Si no tiene unidad asignada, obtenerla del residente
-        if not self.unidad_id and self.residente_id:
-            self.unidad = self.residente.get_unidad()
+        if not self.unidad_id and self.residente_id and (
+            campos is None or {'unidad', 'unidad_id'} & campos
+        ):
+            self.unidad_id = self._unidad_id_del_residente()
         
-        # Calcular recargo por mora automáticamente
-        if self.estado == 'pendiente' and self.esta_vencida:
-            self.calcular_recargo_mora()
+        # Calcular recargo por mora automáticamente (solo pendientes ya vencidas)
+        if (
+            self.estado == 'pendiente'
+            and (campos is None or 'recargo_mora' in campos)
+            and self.fecha_vencimiento and hoy > self.fecha_vencimiento
+        ):
+            self.recargo_mora = self._recargo_por_atraso((hoy - self.fecha_vencimiento).days)
         
         super().save(*args, **kwargs)
+        # Los días anotados en la consulta pueden haber quedado desactualizados
+        self.__dict__.pop('_dias_restantes', None)
+    
+    def _unidad_id_del_residente(self):
+        """
+        Id de la unidad del residente (equivale a residente.get_unidad()), leyendo
+        solo el id en una consulta en lugar de cargar residente y unidad.
+        """
+        if Multa.residente.is_cached(self):
+            codigo = self.residente.unidad_habitacional
+            if not codigo:
+                return None
+        else:
+            codigo = models.Subquery(
+                Residente.objects.filter(pk=self.residente_id).values('unidad_habitacional')[:1]
+            )
+        return UnidadHabitacional.objects.filter(codigo=codigo).values_list('id', flat=True).first()
     
     @property
     def residente_nombre(self):
         """Nombre completo del residente"""
+        # Calculado en la consulta (anotacion_residente_nombre)
+        if '_residente_nombre' in self.__dict__:
+            return self._residente_nombre
         if not self.residente:
             return 'N/A'
         if hasattr(self.residente, 'usuario') and self.residente.usuario:
@@ -179,20 +254,22 @@ class Multa(models.Model):
     @property
     def unidad_nombre(self):
         """Nombre de la unidad habitacional"""
-        return self.unidad.numero if self.unidad else 'N/A'
+        return self.unidad.codigo if self.unidad else 'N/A'
     
     @property
     def esta_vencida(self):
         """Verifica si la multa está vencida"""
-        if self.estado != 'pendiente':
-            return False
-        return timezone.now().date() > self.fecha_vencimiento
+        # Vencida equivale a días restantes negativos: una sola lectura de la fecha
+        return self.dias_vencimiento < 0
     
     @property
     def dias_vencimiento(self):
         """Días restantes para vencimiento (negativos si ya venció)"""
         if self.estado != 'pendiente':
             return 0
+        # Calculado en la consulta (anotacion_dias_vencimiento)
+        if '_dias_restantes' in self.__dict__:
+            return self._dias_restantes.days
         delta = self.fecha_vencimiento - timezone.now().date()
         return delta.days
     
@@ -203,21 +280,32 @@ class Multa(models.Model):
     
     def calcular_recargo_mora(self):
         """Calcula el recargo por mora basado en días de atraso"""
-        if not self.esta_vencida:
+        dias = self.dias_vencimiento
+        if dias >= 0:
             self.recargo_mora = Decimal('0.00')
             return
         
-        dias_atraso = abs(self.dias_vencimiento)
+        self.recargo_mora = self._recargo_por_atraso(-dias)
+    
+    def _recargo_por_atraso(self, dias_atraso):
+        """Recargo para los días de atraso dados"""
         # 2% del monto original por cada día de atraso (máximo 50%)
         porcentaje_recargo = min(dias_atraso * 2, 50)
-        self.recargo_mora = (self.monto * Decimal(str(porcentaje_recargo))) / Decimal('100')
+        return (self.monto * Decimal(str(porcentaje_recargo))) / Decimal('100')
     
-    def marcar_como_pagado(self):
-        """Marca la multa como pagada"""
+    def marcar_como_pagado(self, fecha_pago=None, observaciones=''):
+        """
+        Marca la multa como pagada, en un solo UPDATE junto con el recargo
+        vigente y las observaciones del pago.
+        """
         if self.estado == 'pendiente':
             self.estado = 'pagado'
-            self.fecha_pago = timezone.now().date()
-            self.save(update_fields=['estado', 'fecha_pago', 'fecha_actualizacion'])
+            self.fecha_pago = fecha_pago or timezone.now().date()
+            if observaciones:
+                self.observaciones = f"{self.observaciones}\n{observaciones}"
+            self.save(update_fields=[
+                'estado', 'fecha_pago', 'recargo_mora', 'observaciones', 'fecha_actualizacion'
+            ])
     
     def cancelar(self, motivo=''):
         """Cancela la multa"""
@@ -2,12 +2,13 @@
 Serializers para el módulo de multas.
 """
 from rest_framework import serializers
+from core.serializers import CachedFieldsModelSerializer
 from .models import Multa
 from residentes.serializers import ResidenteSerializer
 from unidades.serializers import UnidadHabitacionalSerializer
 
 
-class MultaSerializer(serializers.ModelSerializer):
+class MultaSerializer(CachedFieldsModelSerializer):
     """
     Serializer completo para Multa con información de residente y unidad.
     """
@@ -63,7 +64,7 @@ class MultaSerializer(serializers.ModelSerializer):
         ]
 
 
-class MultaListSerializer(serializers.ModelSerializer):
+class MultaListSerializer(CachedFieldsModelSerializer):
     """
     Serializer simplificado para listados de multas.
     Optimizado para rendimiento en listados.
@@ -100,7 +101,7 @@ class MultaListSerializer(serializers.ModelSerializer):
         ]
 
 
-class MultaCreateSerializer(serializers.ModelSerializer):
+class MultaCreateSerializer(CachedFieldsModelSerializer):
     """
     Serializer para crear nuevas multas.
     Incluye validaciones específicas.
@@ -0,0 +1,15 @@
+"""
+Signals para el módulo de multas.
+Invalida las estadísticas cacheadas del dashboard cuando cambian las multas.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Multa
+from core.dashboard_views import invalidar_cache_dashboard
+
+
+@receiver([post_save, post_delete], sender=Multa)
+def invalidar_dashboard_multas(sender, **kwargs):
+    """Fuerza el recálculo de las estadísticas del dashboard una vez confirmado el cambio"""
+    transaction.on_commit(invalidar_cache_dashboard)
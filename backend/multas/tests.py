@@ -1,3 +1,91 @@
+"""
+Tests para el módulo de multas.
+"""
 from django.test import TestCase
+from django.utils import timezone
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from .models import Multa, anotacion_dias_vencimiento, anotacion_residente_nombre
+from .serializers import MultaListSerializer
+from .views import VALORES_LISTA, fila_lista
+from residentes.models import Residente
+from unidades.models import UnidadHabitacional
+
+
+class FilaListaTestCase(TestCase):
+    """fila_lista() debe producir lo mismo que MultaListSerializer"""
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.unidad = UnidadHabitacional.objects.create(
+            estado="OCUPADA",
+            direccion="Torre A 101",
+            cantidad_vehiculos=0
+        )
+        self.residente = Residente.objects.create(
+            nombre="Ana",
+            apellido="López",
+            ci="123456",
+            email="ana@test.com",
+            telefono="70000000",
+            tipo="propietario",
+            fecha_ingreso=date.today()
+        )
+        self.residente_sin_unidad = Residente.objects.create(
+            nombre="Luis",
+            apellido="Vargas",
+            ci="654321",
+            email="luis@test.com",
+            telefono="70000001",
+            tipo="inquilino",
+            fecha_ingreso=date.today()
+        )
+        hoy = timezone.now().date()
+
+        self.multas = {
+            'pendiente': Multa.objects.create(
+                tipo='ruido', descripcion='Ruido', monto=Decimal('100.00'),
+                residente=self.residente, unidad=self.unidad,
+                fecha_vencimiento=hoy + timedelta(days=10)
+            ),
+            'vencida': Multa.objects.create(
+                tipo='estacionamiento', descripcion='Garaje', monto=Decimal('75.50'),
+                residente=self.residente, unidad=self.unidad,
+                fecha_vencimiento=hoy - timedelta(days=40)
+            ),
+            'pagada': Multa.objects.create(
+                tipo='area_comun', descripcion='Piscina', monto=Decimal('200.00'),
+                residente=self.residente, unidad=self.unidad,
+                fecha_vencimiento=hoy - timedelta(days=5),
+                estado='pagado', fecha_pago=hoy
+            ),
+            'sin_unidad': Multa.objects.create(
+                tipo='otro', descripcion='Otro', monto=Decimal('50.00'),
+                residente=self.residente_sin_unidad, fecha_vencimiento=hoy + timedelta(days=3)
+            ),
+        }
+
+    def test_misma_representacion_que_serializer(self):
+        """Test: Cada fila coincide con MultaListSerializer(multa).data"""
+        filas = {
+            fila['id']: fila
+            for fila in Multa.objects.annotate(
+                _dias_restantes=anotacion_dias_vencimiento(),
+                _residente_nombre=anotacion_residente_nombre(),
+            ).values(*VALORES_LISTA)
+        }
+        for caso, multa in self.multas.items():
+            with self.subTest(caso=caso):
+                multa = Multa.objects.get(pk=multa.pk)
+                self.assertEqual(
+                    fila_lista(filas[multa.pk]),
+                    dict(MultaListSerializer(multa).data)
+                )
+
+    def test_casos_cubiertos(self):
+        """Test: Los casos del test anterior ejercitan cada rama"""
+        self.assertIsNone(self.multas['sin_unidad'].unidad_id)
+        self.assertEqual(self.multas['pendiente'].unidad_id, self.unidad.pk)
+        self.assertTrue(Multa.objects.get(pk=self.multas['vencida'].pk).esta_vencida)
+        self.assertGreater(Multa.objects.get(pk=self.multas['vencida'].pk).recargo_mora, 0)
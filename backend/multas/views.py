@@ -4,10 +4,12 @@ ViewSet para el módulo de multas.
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from django.db.models import Count, Sum, Q
+from django.db.models import Count, F, Sum, Q
+from django.db.models.functions import TruncMonth
 from django.utils import timezone
+from datetime import date
 from decimal import Decimal
-from .models import Multa
+from .models import Multa, anotacion_dias_vencimiento, anotacion_residente_nombre
 from .serializers import (
     MultaSerializer,
     MultaListSerializer,
@@ -17,6 +19,51 @@ from .serializers import (
 )
 
 
+# Multa.monto_total (monto + recargo_mora) calculado en la base de datos
+MONTO_TOTAL = F('monto') + F('recargo_mora')
+
+# Etiquetas de get_tipo_display / get_estado_display para filas de values()
+TIPO_LABELS = dict(Multa.TIPO_CHOICES)
+ESTADO_LABELS = dict(Multa.ESTADO_CHOICES)
+
+
+# Columnas de MultaListSerializer (only() de las acciones de listado)
+COLUMNAS_LISTA = (
+    'id', 'tipo', 'descripcion', 'monto', 'recargo_mora', 'residente',
+    'unidad', 'unidad__codigo', 'estado', 'fecha_emision', 'fecha_vencimiento',
+)
+# Lo que lee fila_lista(): esas columnas y las anotaciones de get_queryset
+VALORES_LISTA = COLUMNAS_LISTA + ('_dias_restantes', '_residente_nombre')
+
+
+def fila_lista(fila):
+    """
+    Misma representación que MultaListSerializer, a partir de una fila de
+    values(*VALORES_LISTA).
+
+    Para listados sin lógica anidada (pendientes, vencidas) evita instanciar
+    el modelo y recorrer los campos de DRF por fila; MultaListSerializer
+    sigue siendo la referencia del formato.
+    """
+    return {
+        'id': fila['id'],
+        'tipo': fila['tipo'],
+        'tipo_display': TIPO_LABELS.get(fila['tipo'], fila['tipo']),
+        'descripcion': fila['descripcion'],
+        'monto': str(fila['monto']),
+        'monto_total': str(fila['monto'] + fila['recargo_mora']),
+        'residente': fila['residente'],
+        'residente_nombre': fila['_residente_nombre'],
+        'unidad': fila['unidad'],
+        'unidad_nombre': fila['unidad__codigo'] if fila['unidad'] is not None else 'N/A',
+        'estado': fila['estado'],
+        'estado_display': ESTADO_LABELS.get(fila['estado'], fila['estado']),
+        'fecha_emision': fila['fecha_emision'].isoformat(),
+        'fecha_vencimiento': fila['fecha_vencimiento'].isoformat(),
+        'esta_vencida': fila['estado'] == 'pendiente' and fila['_dias_restantes'].days < 0,
+    }
+
+
 class MultaViewSet(viewsets.ModelViewSet):
     """
     ViewSet para gestión de multas.
@@ -28,9 +75,15 @@ class MultaViewSet(viewsets.ModelViewSet):
     - Marcar como pagado
     - Estadísticas
     """
-    queryset = Multa.objects.select_related('residente', 'unidad').all()
+    # residente__usuario: lo leen residente_detalle (username, estado_usuario,
+    # puede_acceder) y residente_nombre sin anotar. El listado lo reemplaza
+    # por sus columnas (ver get_queryset)
+    queryset = Multa.objects.select_related('residente__usuario', 'unidad').all()
     serializer_class = MultaSerializer
     
+    # Acciones que responden con MultaListSerializer (columnas COLUMNAS_LISTA)
+    ACCIONES_LISTA = frozenset({'list', 'pendientes', 'vencidas', 'por_residente'})
+    
     def get_serializer_class(self):
         """Usar serializer apropiado según la acción"""
         if self.action == 'list':
@@ -51,6 +104,20 @@ class MultaViewSet(viewsets.ModelViewSet):
         """
         queryset = super().get_queryset()
         
+        # Días al vencimiento calculados en la consulta, con una sola fecha
+        # para todas las filas (esta_vencida / dias_vencimiento los reutilizan)
+        # (y el nombre del residente, sin cargar residente ni usuario por fila)
+        if self.action != 'estadisticas':
+            queryset = queryset.annotate(
+                _dias_restantes=anotacion_dias_vencimiento(),
+                _residente_nombre=anotacion_residente_nombre(),
+            )
+        if self.action in self.ACCIONES_LISTA:
+            # Solo las columnas de MultaListSerializer
+            queryset = queryset.select_related(None).select_related('unidad').only(
+                *COLUMNAS_LISTA
+            )
+        
         # Residentes solo ven sus propias multas
         if hasattr(self.request.user, 'residente') and self.request.user.residente:
             if not self.request.user.is_staff and not self.request.user.is_superuser:
@@ -88,6 +155,23 @@ class MultaViewSet(viewsets.ModelViewSet):
         
         return queryset
     
+    def _respuesta_paginada(self, multas):
+        """
+        Listado paginado con el formato de MultaListSerializer
+        ({count, next, previous, results}), armado con fila_lista().
+        Sin paginación configurada, carga las filas una vez y cuenta en memoria.
+        """
+        filas = multas.values(*VALORES_LISTA)
+        page = self.paginate_queryset(filas)
+        if page is not None:
+            return self.get_paginated_response([fila_lista(fila) for fila in page])
+        
+        filas = [fila_lista(fila) for fila in filas]
+        return Response({
+            'count': len(filas),
+            'results': filas
+        })
+    
     @action(detail=False, methods=['get'])
     def pendientes(self, request):
         """
@@ -95,12 +179,7 @@ class MultaViewSet(viewsets.ModelViewSet):
         GET /api/multas/pendientes/
         """
         multas = self.get_queryset().filter(estado='pendiente')
-        
-        serializer = MultaListSerializer(multas, many=True)
-        return Response({
-            'count': multas.count(),
-            'results': serializer.data
-        })
+        return self._respuesta_paginada(multas)
     
     @action(detail=False, methods=['get'])
     def vencidas(self, request):
@@ -108,17 +187,11 @@ class MultaViewSet(viewsets.ModelViewSet):
         Lista multas vencidas (pendientes y pasada la fecha de vencimiento).
         GET /api/multas/vencidas/
         """
-        hoy = timezone.now().date()
         multas = self.get_queryset().filter(
             estado='pendiente',
-            fecha_vencimiento__lt=hoy
+            fecha_vencimiento__lt=timezone.now().date()
         )
-        
-        serializer = MultaListSerializer(multas, many=True)
-        return Response({
-            'count': multas.count(),
-            'results': serializer.data
-        })
+        return self._respuesta_paginada(multas)
     
     @action(detail=True, methods=['post'])
     def marcar_pagado(self, request, pk=None):
@@ -145,17 +218,12 @@ class MultaViewSet(viewsets.ModelViewSet):
         
         # Calcular recargo por mora antes de marcar como pagado
         multa.calcular_recargo_mora()
-        multa.marcar_como_pagado()
-        
-        # Agregar observaciones si se proporcionaron
-        if serializer.validated_data.get('observaciones'):
-            multa.observaciones = f"{multa.observaciones}\n{serializer.validated_data['observaciones']}"
-            multa.save(update_fields=['observaciones'])
         
-        # Override fecha_pago si se proporcionó
-        if serializer.validated_data.get('fecha_pago'):
-            multa.fecha_pago = serializer.validated_data['fecha_pago']
-            multa.save(update_fields=['fecha_pago'])
+        # Estado, fecha de pago, recargo y observaciones en un solo UPDATE
+        multa.marcar_como_pagado(
+            fecha_pago=serializer.validated_data.get('fecha_pago'),
+            observaciones=serializer.validated_data.get('observaciones', '')
+        )
         
         return Response(
             MultaSerializer(multa).data,
@@ -200,61 +268,65 @@ class MultaViewSet(viewsets.ModelViewSet):
         - mes: filtrar por mes
         """
         queryset = self.get_queryset()
-        
-        # Conteos por estado
-        total_multas = queryset.count()
-        total_pendientes = queryset.filter(estado='pendiente').count()
-        total_pagadas = queryset.filter(estado='pagado').count()
-        total_canceladas = queryset.filter(estado='cancelado').count()
-        total_en_disputa = queryset.filter(estado='en_disputa').count()
-        
-        # Multas vencidas
         hoy = timezone.now().date()
-        total_vencidas = queryset.filter(
-            estado='pendiente',
-            fecha_vencimiento__lt=hoy
-        ).count()
+        
+        # Conteos por estado, vencidas y montos en una sola consulta
+        resumen = queryset.aggregate(
+            total_multas=Count('id'),
+            total_pendientes=Count('id', filter=Q(estado='pendiente')),
+            total_pagadas=Count('id', filter=Q(estado='pagado')),
+            total_canceladas=Count('id', filter=Q(estado='cancelado')),
+            total_en_disputa=Count('id', filter=Q(estado='en_disputa')),
+            total_vencidas=Count('id', filter=Q(estado='pendiente', fecha_vencimiento__lt=hoy)),
+            monto_total_pendiente=Sum(MONTO_TOTAL, filter=Q(estado='pendiente')),
+            monto_total_pagado=Sum(MONTO_TOTAL, filter=Q(estado='pagado')),
+            monto_total_recargos=Sum('recargo_mora'),
+        )
         
         # Montos
-        pendientes = queryset.filter(estado='pendiente')
-        pagadas = queryset.filter(estado='pagado')
-        
-        monto_total_pendiente = sum(m.monto_total for m in pendientes) or Decimal('0.00')
-        monto_total_pagado = sum(m.monto_total for m in pagadas) or Decimal('0.00')
-        monto_total_recargos = queryset.aggregate(
-            total=Sum('recargo_mora')
-        )['total'] or Decimal('0.00')
-        
-        # Estadísticas por tipo
-        por_tipo = {}
-        for choice in Multa.TIPO_CHOICES:
-            tipo_key = choice[0]
-            count = queryset.filter(tipo=tipo_key).count()
-            if count > 0:
-                por_tipo[choice[1]] = count
+        monto_total_pendiente = resumen['monto_total_pendiente'] or Decimal('0.00')
+        monto_total_pagado = resumen['monto_total_pagado'] or Decimal('0.00')
+        monto_total_recargos = resumen['monto_total_recargos'] or Decimal('0.00')
         
-        # Estadísticas por mes (últimos 12 meses)
-        from datetime import timedelta
-        hace_12_meses = timezone.now().date() - timedelta(days=365)
+        # Estadísticas por tipo: un GROUP BY, en el orden de TIPO_CHOICES
+        conteo_tipos = dict(
+            queryset.order_by().values_list('tipo').annotate(total=Count('id'))
+        )
+        por_tipo = {
+            etiqueta: conteo_tipos[tipo_key]
+            for tipo_key, etiqueta in Multa.TIPO_CHOICES
+            if conteo_tipos.get(tipo_key)
+        }
+        
+        # Estadísticas por mes (últimos 12 meses calendario, del actual hacia
+        # atrás): un GROUP BY por mes
+        meses = []
+        año, mes = hoy.year, hoy.month
+        for _ in range(12):
+            meses.append(date(año, mes, 1))
+            año, mes = (año, mes - 1) if mes > 1 else (año - 1, 12)
+        conteo_meses = {
+            (mes.year, mes.month): total
+            for mes, total in queryset.filter(
+                fecha_emision__gte=meses[-1]
+            ).order_by().annotate(
+                mes=TruncMonth('fecha_emision')
+            ).values_list('mes').annotate(total=Count('id'))
+        }
         por_mes = {}
         
-        for i in range(12):
-            fecha = timezone.now().date() - timedelta(days=30*i)
-            mes_nombre = fecha.strftime('%B %Y')
-            count = queryset.filter(
-                fecha_emision__year=fecha.year,
-                fecha_emision__month=fecha.month
-            ).count()
+        for inicio_mes in meses:
+            count = conteo_meses.get((inicio_mes.year, inicio_mes.month), 0)
             if count > 0:
-                por_mes[mes_nombre] = count
+                por_mes[inicio_mes.strftime('%B %Y')] = count
         
         data = {
-            'total_multas': total_multas,
-            'total_pendientes': total_pendientes,
-            'total_pagadas': total_pagadas,
-            'total_canceladas': total_canceladas,
-            'total_en_disputa': total_en_disputa,
-            'total_vencidas': total_vencidas,
+            'total_multas': resumen['total_multas'],
+            'total_pendientes': resumen['total_pendientes'],
+            'total_pagadas': resumen['total_pagadas'],
+            'total_canceladas': resumen['total_canceladas'],
+            'total_en_disputa': resumen['total_en_disputa'],
+            'total_vencidas': resumen['total_vencidas'],
             'monto_total_pendiente': monto_total_pendiente,
             'monto_total_pagado': monto_total_pagado,
             'monto_total_recargos': monto_total_recargos,
@@ -280,19 +352,21 @@ class MultaViewSet(viewsets.ModelViewSet):
         
         multas = self.get_queryset().filter(residente_id=residente_id)
         
-        total = multas.count()
-        pendientes = multas.filter(estado='pendiente').count()
-        pagadas = multas.filter(estado='pagado').count()
-        monto_pendiente = sum(m.monto_total for m in multas.filter(estado='pendiente'))
+        resumen = multas.aggregate(
+            total=Count('id'),
+            pendientes=Count('id', filter=Q(estado='pendiente')),
+            pagadas=Count('id', filter=Q(estado='pagado')),
+            monto_pendiente=Sum(MONTO_TOTAL, filter=Q(estado='pendiente')),
+        )
         
         serializer = MultaListSerializer(multas, many=True)
         
         return Response({
             'residente_id': residente_id,
-            'total_multas': total,
-            'pendientes': pendientes,
-            'pagadas': pagadas,
-            'monto_total_pendiente': monto_pendiente,
+            'total_multas': resumen['total'],
+            'pendientes': resumen['pendientes'],
+            'pagadas': resumen['pagadas'],
+            'monto_total_pendiente': resumen['monto_pendiente'] or 0,
             'multas': serializer.data
         })
 
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-15 04:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notificaciones', '0002_alter_notificacion_estado'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificacion',
+            name='usuario_destinatario',
+            field=models.ForeignKey(blank=True, help_text='Único usuario que ve la notificación (notificaciones individuales)', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='notificaciones_recibidas', to=settings.AUTH_USER_MODEL, verbose_name='Usuario Destinatario'),
+        ),
+    ]
@@ -64,6 +64,16 @@ class Notificacion(models.Model):
         help_text="Si es True, se puede asignar a usuarios específicos"
     )
     
+    usuario_destinatario = models.ForeignKey(
+        'users.CustomUser',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='notificaciones_recibidas',
+        verbose_name="Usuario Destinatario",
+        help_text="Único usuario que ve la notificación (notificaciones individuales)"
+    )
+    
     # Fechas y programación
     fecha_programada = models.DateTimeField(
         null=True,
@@ -27,6 +27,7 @@ class NotificacionSerializer(serializers.ModelSerializer):
             'roles_destinatarios',
             'roles_destinatarios_info',
             'es_individual',
+            'usuario_destinatario',
             'fecha_programada',
             'fecha_expiracion',
             'prioridad',
@@ -37,9 +37,12 @@ class NotificacionViewSet(viewsets.ModelViewSet):
             # Solo mostrar notificaciones activas y enviadas
             queryset = queryset.filter(activa=True, estado='enviada')
             
-            # Filtrar por roles del usuario actual
+            # Las individuales solo las ve su destinatario; el resto, por
+            # roles del usuario actual
+            dirigidas = Q(usuario_destinatario__isnull=True)
             if user.rol:
-                queryset = queryset.filter(roles_destinatarios=user.rol)
+                dirigidas &= Q(roles_destinatarios=user.rol)
+            queryset = queryset.filter(dirigidas | Q(usuario_destinatario=user))
         
         # Verificar si se solicita sólo las notificaciones del usuario actual
         if self.request.query_params.get('usuario_actual') == 'true':
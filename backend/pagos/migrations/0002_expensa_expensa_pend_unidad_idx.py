@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-15 02:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0001_initial'),
+        ('unidades', '0002_add_codigo_field'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expensa',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'pagado_parcial'])), fields=['unidad'], include=('monto_total', 'monto_pagado'), name='expensa_pend_unidad_idx'),
+        ),
+    ]
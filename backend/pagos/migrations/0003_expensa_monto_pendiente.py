@@ -0,0 +1,32 @@
+# Generated by Django 5.0.7 on 2026-10-15 03:02
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0002_expensa_expensa_pend_unidad_idx'),
+        ('unidades', '0002_add_codigo_field'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expensa',
+            name='expensa_pend_unidad_idx',
+        ),
+        migrations.AddField(
+            model_name='expensa',
+            name='monto_pendiente',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(models.F('monto_total'), '-', models.F('monto_pagado')), output_field=models.DecimalField(decimal_places=2, max_digits=10), verbose_name='Monto Pendiente'),
+        ),
+        migrations.AddIndex(
+            model_name='expensa',
+            index=models.Index(fields=['monto_pendiente'], name='pagos_expen_monto_p_d7855e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensa',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'pagado_parcial'])), fields=['unidad'], include=('monto_pendiente',), name='expensa_pend_unidad_idx'),
+        ),
+    ]
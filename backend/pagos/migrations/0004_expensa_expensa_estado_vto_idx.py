@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-15 03:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pagos', '0003_expensa_monto_pendiente'),
+        ('unidades', '0002_add_codigo_field'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expensa',
+            index=models.Index(condition=models.Q(('estado__in', ['pendiente', 'pagado_parcial'])), fields=['estado', 'fecha_vencimiento'], name='expensa_estado_vto_idx'),
+        ),
+    ]
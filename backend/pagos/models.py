@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from decimal import Decimal
 from unidades.models import UnidadHabitacional
+from core.dashboard_views import invalidar_cache_dashboard
 
 
 class Expensa(models.Model):
@@ -67,6 +70,14 @@ class Expensa(models.Model):
         verbose_name='Monto Pagado'
     )
     
+    # Calculado por la base de datos (monto_total - monto_pagado)
+    monto_pendiente = models.GeneratedField(
+        expression=models.F('monto_total') - models.F('monto_pagado'),
+        output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        db_persist=True,
+        verbose_name='Monto Pendiente'
+    )
+    
     # Estado
     estado = models.CharField(
         max_length=20,
@@ -104,6 +115,20 @@ class Expensa(models.Model):
             models.Index(fields=['periodo']),
             models.Index(fields=['estado']),
             models.Index(fields=['fecha_vencimiento']),
+            models.Index(fields=['monto_pendiente']),
+            # Expensas vencidas / unidades morosas: solo expensas impagas
+            models.Index(
+                fields=['estado', 'fecha_vencimiento'],
+                name='expensa_estado_vto_idx',
+                condition=models.Q(estado__in=['pendiente', 'pagado_parcial']),
+            ),
+            # Deuda por unidad: solo expensas impagas, con el saldo incluido
+            models.Index(
+                fields=['unidad'],
+                name='expensa_pend_unidad_idx',
+                condition=models.Q(estado__in=['pendiente', 'pagado_parcial']),
+                include=['monto_pendiente'],
+            ),
         ]
     
     def __str__(self):
@@ -269,13 +294,50 @@ class Pago(models.Model):
     
     def save(self, *args, **kwargs):
         """Actualizar el monto pagado en la expensa"""
-        super().save(*args, **kwargs)
-        
-        # Actualizar monto pagado en la expensa
-        expensa = self.expensa
-        total_pagado = expensa.pagos.aggregate(
-            total=models.Sum('monto')
-        )['total'] or Decimal('0.00')
+        # Pago y expensa en una transacción; el dashboard se invalida al
+        # confirmar, cuando la expensa ya tiene el nuevo total
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self._actualizar_expensa()
+            transaction.on_commit(invalidar_cache_dashboard)
+    
+    def _actualizar_expensa(self):
+        """
+        Un solo UPDATE de la expensa, sin cargarla: total pagado (suma de sus
+        pagos) y estado con las mismas reglas que Expensa.save()
+        """
+        total_pagado = Coalesce(
+            models.Subquery(
+                Pago.objects.filter(expensa_id=models.OuterRef('pk'))
+                .order_by()
+                .values('expensa_id')
+                .annotate(total=models.Sum('monto'))
+                .values('total')
+            ),
+            models.Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=10, decimal_places=2),
+        )
+        ahora = timezone.now()
+        Expensa.objects.filter(pk=self.expensa_id).update(
+            monto_pagado=total_pagado,
+            estado=models.Case(
+                models.When(
+                    GreaterThanOrEqual(total_pagado, models.F('monto_total')),
+                    then=models.Value(Expensa.ESTADO_PAGADO),
+                ),
+                models.When(
+                    GreaterThan(total_pagado, Decimal('0.00')),
+                    then=models.Value(Expensa.ESTADO_PAGADO_PARCIAL),
+                ),
+                models.When(
+                    fecha_vencimiento__lt=ahora.date(),
+                    then=models.Value(Expensa.ESTADO_VENCIDO),
+                ),
+                default=models.Value(Expensa.ESTADO_PENDIENTE),
+            ),
+            fecha_actualizacion=ahora,
+        )
         
-        expensa.monto_pagado = total_pagado
-        expensa.save()
+        # La expensa cargada en memoria (si la hay) quedó desactualizada
+        if Pago.expensa.is_cached(self):
+            Pago.expensa.field.delete_cached_value(self)
@@ -0,0 +1,16 @@
+"""
+Signals para el módulo de pagos.
+Invalida las estadísticas cacheadas del dashboard cuando cambian expensas o pagos.
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import Expensa, Pago
+from core.dashboard_views import invalidar_cache_dashboard
+
+
+@receiver([post_save, post_delete], sender=Expensa)
+@receiver([post_save, post_delete], sender=Pago)
+def invalidar_dashboard_pagos(sender, **kwargs):
+    """Fuerza el recálculo de las estadísticas del dashboard una vez confirmado el cambio"""
+    transaction.on_commit(invalidar_cache_dashboard)
@@ -1,3 +1,81 @@
+"""
+Tests para el módulo de pagos.
+"""
 from django.test import TestCase
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from .models import Expensa, Pago
+from unidades.models import UnidadHabitacional
+
+
+class PagoActualizaExpensaTestCase(TestCase):
+    """
+    Pago.save() actualiza la expensa con un UPDATE en SQL; el resultado debe
+    coincidir con las reglas de Expensa.save()
+    """
+
+    def setUp(self):
+        """Configuración inicial para los tests"""
+        self.unidad = UnidadHabitacional.objects.create(
+            estado="OCUPADA",
+            direccion="Torre A 101",
+            cantidad_vehiculos=0
+        )
+        self.hoy = timezone.now().date()
+
+    def crear_expensa(self, periodo, vencida):
+        """Expensa de Bs. 100 (80 + 20), vencida o por vencer"""
+        return Expensa.objects.create(
+            unidad=self.unidad,
+            periodo=periodo,
+            monto_base=Decimal('80.00'),
+            monto_adicional=Decimal('20.00'),
+            fecha_emision=self.hoy - timedelta(days=30),
+            fecha_vencimiento=self.hoy + timedelta(days=-5 if vencida else 5),
+        )
+
+    def assertMismasReglasQueExpensaSave(self, expensa, montos):
+        """Registra los pagos y compara la expensa con lo que calcula Expensa.save()"""
+        for monto in montos:
+            Pago.objects.create(expensa=expensa, monto=monto, metodo_pago=Pago.METODO_EFECTIVO)
+
+        expensa.refresh_from_db()
+        self.assertEqual(expensa.monto_pagado, sum(montos, Decimal('0.00')))
+        estado_sql = expensa.estado
+
+        # Expensa.save() recalcula el estado a partir del mismo monto_pagado
+        expensa.save()
+        expensa.refresh_from_db()
+        self.assertEqual(estado_sql, expensa.estado)
+        return estado_sql
+
+    def test_pago_parcial(self):
+        """Test: Pago parcial, con y sin vencimiento"""
+        for periodo, vencida in (('2025-01', False), ('2025-02', True)):
+            with self.subTest(vencida=vencida):
+                expensa = self.crear_expensa(periodo, vencida)
+                estado = self.assertMismasReglasQueExpensaSave(expensa, [Decimal('40.00')])
+                self.assertEqual(estado, Expensa.ESTADO_PAGADO_PARCIAL)
+
+    def test_pago_completo(self):
+        """Test: Pagos que cubren el total, con y sin vencimiento"""
+        for periodo, vencida in (('2025-03', False), ('2025-04', True)):
+            with self.subTest(vencida=vencida):
+                expensa = self.crear_expensa(periodo, vencida)
+                estado = self.assertMismasReglasQueExpensaSave(
+                    expensa, [Decimal('60.00'), Decimal('40.00')]
+                )
+                self.assertEqual(estado, Expensa.ESTADO_PAGADO)
+
+    def test_pago_en_cero(self):
+        """Test: Pago de monto cero, con y sin vencimiento"""
+        for periodo, vencida, esperado in (
+            ('2025-05', False, Expensa.ESTADO_PENDIENTE),
+            ('2025-06', True, Expensa.ESTADO_VENCIDO),
+        ):
+            with self.subTest(vencida=vencida):
+                expensa = self.crear_expensa(periodo, vencida)
+                estado = self.assertMismasReglasQueExpensaSave(expensa, [Decimal('0.00')])
+                self.assertEqual(estado, esperado)
@@ -34,8 +34,6 @@ class PersonalAdmin(admin.ModelAdmin):
         'codigo_empleado'
     ]
 
-    search_fields = ["nombre", "apellido", "email", "ci", "departamento"]
-
     readonly_fields = [
         'fecha_creacion',
         'fecha_actualizacion',
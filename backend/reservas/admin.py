@@ -5,6 +5,11 @@ from django.utils import timezone
 from .models import Reserva
 
 
+# Las acciones masivas recorren la selección por bloques (iterator) en lugar
+# de cargar todas las reservas en memoria
+_LOTE_ACCIONES = 500
+
+
 @admin.register(Reserva)
 class ReservaAdmin(admin.ModelAdmin):
     list_display = [
@@ -133,7 +138,7 @@ class ReservaAdmin(admin.ModelAdmin):
     def aprobar_reservas(self, request, queryset):
         """Aprueba las reservas seleccionadas"""
         reservas_aprobadas = 0
-        for reserva in queryset.filter(estado=Reserva.ESTADO_PENDIENTE):
+        for reserva in queryset.filter(estado=Reserva.ESTADO_PENDIENTE).iterator(chunk_size=_LOTE_ACCIONES):
             reserva.aprobar(request.user)
             reservas_aprobadas += 1
         
@@ -146,7 +151,7 @@ class ReservaAdmin(admin.ModelAdmin):
     def rechazar_reservas(self, request, queryset):
         """Rechaza las reservas seleccionadas"""
         reservas_rechazadas = 0
-        for reserva in queryset.filter(estado=Reserva.ESTADO_PENDIENTE):
+        for reserva in queryset.filter(estado=Reserva.ESTADO_PENDIENTE).iterator(chunk_size=_LOTE_ACCIONES):
             reserva.rechazar(request.user, "Rechazada desde admin")
             reservas_rechazadas += 1
         
@@ -159,7 +164,7 @@ class ReservaAdmin(admin.ModelAdmin):
     def cancelar_reservas(self, request, queryset):
         """Cancela las reservas seleccionadas"""
         reservas_canceladas = 0
-        for reserva in queryset.filter(estado__in=[Reserva.ESTADO_PENDIENTE, Reserva.ESTADO_CONFIRMADA]):
+        for reserva in queryset.filter(estado__in=[Reserva.ESTADO_PENDIENTE, Reserva.ESTADO_CONFIRMADA]).iterator(chunk_size=_LOTE_ACCIONES):
             reserva.cancelar("Cancelada desde admin")
             reservas_canceladas += 1
         
@@ -172,7 +177,7 @@ class ReservaAdmin(admin.ModelAdmin):
     def completar_reservas(self, request, queryset):
         """Marca como completadas las reservas seleccionadas"""
         reservas_completadas = 0
-        for reserva in queryset.filter(estado=Reserva.ESTADO_CONFIRMADA):
+        for reserva in queryset.filter(estado=Reserva.ESTADO_CONFIRMADA).iterator(chunk_size=_LOTE_ACCIONES):
             reserva.completar()
             reservas_completadas += 1
         
@@ -20,6 +20,7 @@ class Residente(models.Model):
         ('suspendido', 'Suspendido'),
         ('en_proceso', 'En Proceso de Aprobación'),
     ]
+    ESTADOS_VALIDOS = frozenset(estado for estado, _ in ESTADOS_CHOICES)
     
     TIPO_CHOICES = [
         ('propietario', 'Propietario'),
@@ -145,7 +146,7 @@ class Residente(models.Model):
     
     def cambiar_estado(self, nuevo_estado):
         """Cambia el estado del residente"""
-        if nuevo_estado in [choice[0] for choice in self.ESTADOS_CHOICES]:
+        if nuevo_estado in self.ESTADOS_VALIDOS:
             self.estado = nuevo_estado
             self.save(update_fields=['estado', 'fecha_actualizacion'])
             return True
@@ -142,6 +142,7 @@ class MantenimientoSeeder(BaseSeeder):
         ]
         
         tareas_creadas = []
+        registros = []
         
         for i, tarea_data in enumerate(tareas_ejemplo):
             try:
@@ -192,22 +193,22 @@ class MantenimientoSeeder(BaseSeeder):
                 tarea.save()
                 tareas_creadas.append(tarea)
                 
-                # Crear registro inicial
-                RegistroMantenimiento.objects.create(
-                    tarea=tarea,
-                    tipo_accion='creacion',
-                    descripcion=f'Tarea creada: {tarea.titulo}',
-                    realizado_por=admin
-                )
+                # Registro inicial (se insertan todos juntos al final)
+                registros.append({
+                    'tarea': tarea,
+                    'tipo_accion': 'creacion',
+                    'descripcion': f'Tarea creada: {tarea.titulo}',
+                    'realizado_por': admin,
+                })
                 
-                # Si la tarea está asignada, crear registro de asignación
+                # Si la tarea está asignada, registro de asignación
                 if tarea.personal_asignado:
-                    RegistroMantenimiento.objects.create(
-                        tarea=tarea,
-                        tipo_accion='asignacion',
-                        descripcion=f'Tarea asignada a {tarea.personal_asignado.nombre_completo}',
-                        realizado_por=admin
-                    )
+                    registros.append({
+                        'tarea': tarea,
+                        'tipo_accion': 'asignacion',
+                        'descripcion': f'Tarea asignada a {tarea.personal_asignado.nombre_completo}',
+                        'realizado_por': admin,
+                    })
                 
                 # Si está en progreso o completada, agregar materiales de ejemplo
                 if tarea.estado in ['en_progreso', 'completada']:
@@ -243,6 +244,9 @@ class MantenimientoSeeder(BaseSeeder):
             except Exception as e:
                 print(f"  ❌ Error creando tarea {tarea_data['titulo']}: {e}")
         
+        # Historial de todas las tareas en un solo INSERT
+        RegistroMantenimiento.log_many(registros)
+        
         print(f"\n✅ Creadas {len(tareas_creadas)} tareas de mantenimiento exitosamente")
         print(f"   - Pendientes: {TareaMantenimiento.objects.filter(estado='pendiente').count()}")
         print(f"   - Asignadas: {TareaMantenimiento.objects.filter(estado='asignada').count()}")
@@ -87,7 +87,7 @@ class CustomUserAdmin(BaseUserAdmin):
         "fecha_creacion",
     ]
     list_filter = ["rol", "is_active", "is_staff", "is_superuser", "fecha_creacion"]
-    search_fields = ["username", "email", "first_name", "last_name", "codigo_empleado"]
+    search_fields = ["username", "email", "first_name", "last_name"]
     ordering = ["-fecha_creacion"]
 
     fieldsets = BaseUserAdmin.fieldsets + (
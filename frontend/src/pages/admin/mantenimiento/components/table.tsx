@@ -167,7 +167,7 @@ export function TareasTable({
                   </Badge>
                 </TableCell>
                 <TableCell>
-                  {tarea.personal_asignado_detalle?.nombre_completo || 'Sin asignar'}
+                  {tarea.personal_asignado_nombre || 'Sin asignar'}
                 </TableCell>
                 <TableCell>
                   {formatDate(tarea.fecha_limite)}
@@ -56,6 +56,7 @@ export interface Reservas {
   pendientes: number;
   mes_actual: number;
   por_area: {
+    area_comun_id: number;
     area_comun__nombre: string;
     total: number;
   }[];
@@ -94,6 +95,7 @@ export interface Graficos {
     cantidad: number;
   }[];
   reservas_por_area: {
+    area_comun_id: number;
     area_comun__nombre: string;
     total: number;
   }[];
@@ -76,6 +76,7 @@ export interface TareaMantenimiento {
   area_comun?: number | null;
   area_comun_detalle?: AreaComun | null;
   personal_asignado?: number | null;
+  personal_asignado_nombre?: string | null;
   personal_asignado_detalle?: Personal | null;
   creado_por: number;
   creado_por_nombre?: string;